@@ -0,0 +1,31 @@
+"""add blocks data size and hash
+
+Revision ID: 3b1f0c8e2a47
+Revises: df7eed9170a9
+Create Date: 2026-10-18 20:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f0c8e2a47'
+down_revision = 'df7eed9170a9'
+branch_labels = None
+depends_on = None
+
+# Rows larger than this number of bytes get their data moved to the TOAST table, compressed
+TOAST_TUPLE_TARGET = 512
+
+
+def upgrade():
+    op.add_column('blocks', sa.Column('size', sa.Integer(), sa.Computed('octet_length(data::text)'), nullable=False))
+    op.add_column('blocks', sa.Column('hash', sa.String(32), sa.Computed('md5(data::text)'), nullable=False))
+    op.execute(f'ALTER TABLE blocks SET (toast_tuple_target = {TOAST_TUPLE_TARGET})')
+
+
+def downgrade():
+    op.execute('ALTER TABLE blocks RESET (toast_tuple_target)')
+    op.drop_column('blocks', 'hash')
+    op.drop_column('blocks', 'size')
@@ -0,0 +1,35 @@
+"""add pages author and covering blocks indexes
+
+Revision ID: 7c2d4e9a1f53
+Revises: 3b1f0c8e2a47
+Create Date: 2026-10-18 22:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d4e9a1f53'
+down_revision = '3b1f0c8e2a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The pages of an author, by edition date. Also used to give the pages of a deleted user to DeletedAccount
+    op.create_index('pages_author_edited_idx', 'pages', ['author', 'edited'])
+    # The ranks of a page with their block ids read from the index alone (neighbours, rebalancing, swaps).
+    # Alembic cannot declare INCLUDE on a constraint
+    op.execute(
+        'ALTER TABLE blocks DROP CONSTRAINT blocks_page_id_sequence_key, '
+        'ADD CONSTRAINT blocks_page_id_sequence_key UNIQUE (page_id, sequence) INCLUDE (id) DEFERRABLE'
+    )
+
+
+def downgrade():
+    op.execute(
+        'ALTER TABLE blocks DROP CONSTRAINT blocks_page_id_sequence_key, '
+        'ADD CONSTRAINT blocks_page_id_sequence_key UNIQUE (page_id, sequence) DEFERRABLE'
+    )
+    op.drop_index('pages_author_edited_idx', table_name='pages')
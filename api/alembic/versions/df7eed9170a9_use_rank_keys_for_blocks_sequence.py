@@ -0,0 +1,70 @@
+"""use rank keys for blocks sequence
+
+Revision ID: df7eed9170a9
+Revises: 532b6213b646
+Create Date: 2026-10-18 19:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from api.models.rank import generate_key_between
+
+
+# revision identifiers, used by Alembic.
+revision = 'df7eed9170a9'
+down_revision = '532b6213b646'
+branch_labels = None
+depends_on = None
+
+SEQUENCE_STEP = 256
+
+
+def upgrade():
+    op.drop_constraint('blocks_page_id_sequence_key', 'blocks', type_='unique')
+    op.alter_column(
+        'blocks', 'sequence',
+        existing_type=sa.Integer(),
+        type_=sa.String(collation='C'),
+        existing_nullable=False,
+        postgresql_using='sequence::text',
+    )
+
+    # Give every block a key after the previous one of its page, in the current order
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT page_id, id FROM blocks ORDER BY page_id, sequence::integer")).fetchall()
+    keys = []
+    page_id, key = None, None
+    for row in rows:
+        if row.page_id != page_id:
+            page_id, key = row.page_id, None
+
+        key = generate_key_between(key, None)
+        keys.append({'page_id': row.page_id, 'id': row.id, 'sequence': key})
+
+    if keys:
+        conn.execute(sa.text("UPDATE blocks SET sequence = :sequence WHERE page_id = :page_id AND id = :id"), keys)
+
+    op.create_unique_constraint(
+        'blocks_page_id_sequence_key', 'blocks', ['page_id', 'sequence'], deferrable=True
+    )
+
+
+def downgrade():
+    op.drop_constraint('blocks_page_id_sequence_key', 'blocks', type_='unique')
+    op.execute(
+        "UPDATE blocks SET sequence = ranked.seq FROM ("
+        f"SELECT page_id, id, (row_number() OVER (PARTITION BY page_id ORDER BY sequence)) * {SEQUENCE_STEP} AS seq "
+        "FROM blocks) ranked "
+        "WHERE blocks.page_id = ranked.page_id AND blocks.id = ranked.id"
+    )
+    op.alter_column(
+        'blocks', 'sequence',
+        existing_type=sa.String(collation='C'),
+        type_=sa.Integer(),
+        existing_nullable=False,
+        postgresql_using='sequence::integer',
+    )
+    op.create_unique_constraint(
+        'blocks_page_id_sequence_key', 'blocks', ['page_id', 'sequence'], deferrable=True
+    )
@@ -0,0 +1,33 @@
+"""add pages listing indexes
+
+Revision ID: e5a91c3b7d20
+Revises: 7c2d4e9a1f53
+Create Date: 2026-10-18 23:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a91c3b7d20'
+down_revision = '7c2d4e9a1f53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The listings go from the most recent pages, and the id orders the pages edited or created at the same time
+    op.create_index('pages_edited_id_idx', 'pages', ['edited', 'id'])
+    op.create_index('pages_created_id_idx', 'pages', ['created', 'id'])
+    op.create_index('pages_author_edited_id_idx', 'pages', ['author', 'edited', 'id'])
+    op.create_index('pages_author_created_id_idx', 'pages', ['author', 'created', 'id'])
+    op.drop_index('pages_author_edited_idx', table_name='pages')
+
+
+def downgrade():
+    op.create_index('pages_author_edited_idx', 'pages', ['author', 'edited'])
+    op.drop_index('pages_author_created_id_idx', table_name='pages')
+    op.drop_index('pages_author_edited_id_idx', table_name='pages')
+    op.drop_index('pages_created_id_idx', table_name='pages')
+    op.drop_index('pages_edited_id_idx', table_name='pages')
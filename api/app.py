@@ -1,11 +1,18 @@
 import asyncio
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from api.models.base import db
-from api.routers import auth, gateway, page, users
+from api.cache import LRUCache
+from api.models.base import db, read_db, stick_to_primary
+from api.models.constant import DATABASE_READ_STICKINESS
+from api.models.page import edits
+from api.models.pool import PoolTimeout
+from api.routers import auth, export, gateway, metrics, page, users
 from api.routers.auth.constant import API_DOMAIN_NAME, WEB_DOMAIN_NAME
+from api.routers.auth.login import oauth2_scheme
+from api.routers.utils import NEXT_CURSOR_HEADER
 
 origins = {API_DOMAIN_NAME, WEB_DOMAIN_NAME}
 
@@ -16,19 +23,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 app.include_router(auth.router)
+app.include_router(export.router)
 app.include_router(gateway.router)
+app.include_router(metrics.router)
 app.include_router(page.router)
 app.include_router(users.router)
 
+# Clients that recently wrote, by token, whose reads stick to the primary until the replica has their changes.
+# Remembered by each worker: a client whose requests go to several workers can still read its writes late
+writers: LRUCache[str, bool] = LRUCache(100_000, DATABASE_READ_STICKINESS)
+
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    if read_db is db:
+        return await call_next(request)
+
+    client = request.cookies.get(oauth2_scheme.cookie_name) or request.headers.get("Authorization")
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        stick_to_primary()
+        response = await call_next(request)
+        if client is not None:
+            writers.set(client, True)
+        return response
+
+    if client is not None and client in writers:
+        stick_to_primary()
+    return await call_next(request)
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout(request: Request, exc: PoolTimeout):
+    # Every connection is busy: the client can retry once the load goes down
+    return JSONResponse(
+        {"detail": "The database is overloaded, retry later."},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
+
 
 @app.on_event("startup")
 async def startup():
     exception = None
     for retries in range(5):
         try:
-            await db.connect()
+            for database in {db, read_db}:
+                if not database.is_connected:
+                    await database.connect()
             break
         except ConnectionRefusedError as e:
             exception = e
@@ -43,9 +87,13 @@ async def startup():
         if getattr(auth, key) is None:
             raise ValueError(f"{key!r} env variable is required but not set.")
 
+    await gateway.backplane.start()
     gateway.export_messages()
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await db.disconnect()
+    await gateway.backplane.stop()
+    await edits.stop()
+    for database in {db, read_db}:
+        await database.disconnect()
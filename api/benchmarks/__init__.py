@@ -0,0 +1,8 @@
+"""
+Micro-benchmarks of the API hot paths.
+Run one inside the api container with `python -m api.benchmarks.<name>`.
+"""
+
+
+def report(name: str, seconds: float, number: int, unit: str = "op"):
+    print(f"{name:<48} {seconds / number * 1e6:>10.2f} µs/{unit} {number / seconds:>14,.0f} {unit}/s")
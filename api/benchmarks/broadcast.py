@@ -0,0 +1,39 @@
+"""Compare the cost of encoding a broadcasted message for every recipient against encoding it once."""
+import timeit
+
+from api.routers.gateway.client import MessageModel
+from api.routers.gateway.frame import Frame, message_id
+from api.routers.gateway.messages.clientbound.page import BlockModified
+from api.routers.utils import tosnake
+
+from . import report
+
+CLIENTS = (1, 10, 50, 200)
+NUMBER = 2_000
+
+
+def per_client(msg: BlockModified, clients: int):
+    for _ in range(clients):
+        MessageModel(id=tosnake(msg.__class__.__name__), data=msg.dict()).json()
+
+
+def once(msg: BlockModified, clients: int):
+    frame = Frame.from_message(msg)
+    for _ in range(clients):
+        frame.text
+
+
+def main():
+    msg = BlockModified(block_id="a1b2c3d4e5")
+
+    report("tosnake(name)", timeit.timeit(lambda: tosnake(msg.__class__.__name__), number=NUMBER * 10), NUMBER * 10)
+    report("message_id(cls)", timeit.timeit(lambda: message_id(type(msg)), number=NUMBER * 10), NUMBER * 10)
+
+    for clients in CLIENTS:
+        for func in (per_client, once):
+            seconds = timeit.timeit(lambda: func(msg, clients), number=NUMBER)
+            report(f"{func.__name__}, {clients} clients", seconds, NUMBER, "broadcast")
+
+
+if __name__ == "__main__":
+    main()
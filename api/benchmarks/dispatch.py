@@ -0,0 +1,66 @@
+"""Measure the messages/sec going through `Client.handle_message`, for every registered serverbound message."""
+import asyncio
+import time
+from typing import Any, Literal, get_args, get_origin
+
+from pydantic import BaseModel, ConstrainedStr
+
+from api.routers.gateway.client import Client
+from api.routers.gateway.messages.serverbound.register import serverbound_messages, serverbound_parsers
+
+from . import report
+
+NUMBER = 20_000
+
+
+def example(cls: type[BaseModel]) -> dict[str, Any]:
+    """Build valid data for a message."""
+    data = {}
+    for name, field in cls.__fields__.items():
+        tp = field.type_
+        if get_origin(tp) is Literal:
+            data[field.alias] = get_args(tp)[0]
+        elif isinstance(tp, type) and issubclass(tp, ConstrainedStr):
+            data[field.alias] = "a" * (tp.max_length or 10)
+        else:
+            data[field.alias] = {bool: True, int: 42, str: "abcdef", dict: {"a": [1, 2]}}[tp]
+
+    return data
+
+
+async def noop(self, client: Client):
+    pass
+
+
+async def legacy_handle_message(client: Client, msg: dict):
+    """`Client.handle_message` before the precompiled parsers"""
+    if "id" not in msg or "data" not in msg:
+        raise ValueError("Message is missing id or data")
+
+    cls = serverbound_messages.get(msg["id"])
+    if cls is None:
+        raise ValueError(f"Invalid serverbound message: {msg['id']}")
+
+    await cls(**msg["data"]).handle(client)
+
+
+async def main():
+    client = Client(None, None)
+    for msgid, cls in serverbound_messages.items():
+        # Only the dispatch is measured, not what the messages do
+        cls.handle = noop
+        msg = {"id": msgid, "data": example(cls)}
+        assert serverbound_parsers[msgid](msg["data"]) == cls(**msg["data"])
+
+        for name, handle in (("legacy", legacy_handle_message), ("compiled", Client.handle_message)):
+            start = time.perf_counter()
+            for _ in range(NUMBER):
+                await handle(client, msg)
+
+            report(f"{msgid}, {name}", time.perf_counter() - start, NUMBER, "msg")
+
+    client.writer.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
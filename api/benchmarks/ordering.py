@@ -0,0 +1,82 @@
+"""
+Measure the write amplification of inserting blocks again and again at the same position of a long page:
+the number of rows written per inserted block, with the former integer sequences and with the rank keys.
+The page is simulated in memory, following what `Block._insert` writes.
+"""
+import time
+
+from api.models.page import MAX_KEY_LENGTH, REBALANCED_KEY_LENGTH
+from api.models.rank import generate_key_between, generate_n_keys_between
+
+from . import report
+
+PAGE_SIZE = 10_000
+INSERTS = 10_000
+# Position of the insertions, in the middle of the page
+POSITION = PAGE_SIZE // 2
+
+# Spacing of the former integer sequences
+SEQUENCE_STEP = 256
+
+
+def integer_sequences() -> tuple[int, int]:
+    """Midpoint between the neighbours, renumbering the whole page when they are consecutive."""
+    page = [SEQUENCE_STEP * (i + 1) for i in range(PAGE_SIZE)]
+    writes = flattens = 0
+    for _ in range(INSERTS):
+        if page[POSITION] - page[POSITION - 1] <= 1:
+            page = [SEQUENCE_STEP * (i + 1) for i in range(len(page))]
+            writes += len(page)
+            flattens += 1
+
+        page.insert(POSITION, (page[POSITION - 1] + page[POSITION]) // 2)
+        writes += 1
+
+    return writes, flattens
+
+
+def rank_keys() -> tuple[int, int, int]:
+    """Key between the neighbours, respacing the smallest window around them when the key gets too long."""
+    page = generate_n_keys_between(None, None, PAGE_SIZE)
+    writes = rebalances = longest = 0
+    for _ in range(INSERTS):
+        key = generate_key_between(page[POSITION - 1], page[POSITION])
+        if len(key) > MAX_KEY_LENGTH:
+            size = 1
+            while True:
+                start, end = max(POSITION - size, 0), min(POSITION + size, len(page))
+                low = page[start - 1] if start > 0 else None
+                high = page[end] if end < len(page) else None
+                keys = generate_n_keys_between(low, high, end - start + 1)
+                if max(map(len, keys)) <= REBALANCED_KEY_LENGTH or (low is None and high is None):
+                    break
+
+                size *= 2
+
+            key = keys.pop(POSITION - start)
+            page[start:end] = keys
+            writes += len(keys)
+            rebalances += 1
+
+        page.insert(POSITION, key)
+        writes += 1
+        longest = max(longest, len(key))
+
+    return writes, rebalances, longest
+
+
+def main():
+    start = time.perf_counter()
+    writes, flattens = integer_sequences()
+    report("integer sequences", time.perf_counter() - start, INSERTS, "insert")
+    print(f"    {writes:,} rows written, {writes / INSERTS:.1f} per insert, {flattens} page renumberings")
+
+    start = time.perf_counter()
+    writes, rebalances, longest = rank_keys()
+    report("rank keys", time.perf_counter() - start, INSERTS, "insert")
+    print(f"    {writes:,} rows written, {writes / INSERTS:.1f} per insert, {rebalances} window rebalances")
+    print(f"    longest key: {longest} characters")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measure the per-call overhead of the queries of the hot paths, built and compiled with SQLAlchemy on each call
+against compiled once with `Query`. Needs the database of `DATABASE_URL`.
+"""
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from api.models.base import db
+from api.models.page import GET_BLOCK, PAGE_EDITED, Block, DBBlock, DBPage
+from api.models.user import USERPASS_BY_USERNAME, DBUser
+
+from . import report
+
+NUMBER = 5_000
+
+
+def cases(page_id: int, block_id: str, username: str):
+    """Name, statement built per call and its compiled `Query` with the values."""
+    return [
+        (
+            "page edited",
+            lambda: select(DBPage.edited).where(DBPage.id == page_id),
+            PAGE_EDITED,
+            {"page_id": page_id},
+        ),
+        (
+            "block",
+            lambda: select(DBBlock).where(DBBlock.page_id == page_id, DBBlock.id == block_id),
+            GET_BLOCK,
+            {"page_id": page_id, "block_id": block_id},
+        ),
+        (
+            "user",
+            lambda: select(DBUser).where(DBUser.username == username),
+            USERPASS_BY_USERNAME,
+            {"username": username},
+        ),
+        (
+            "slice",
+            lambda: select(DBBlock).where(DBBlock.page_id == page_id).order_by(DBBlock.sequence).limit(25),
+            Block._slice(False, True, False),
+            {"page_id": page_id, "size": 25},
+        ),
+    ]
+
+
+async def main():
+    await db.connect()
+    try:
+        async with db.connection() as connection:
+            backend = connection._connection
+            for name, build, query, values in cases(1, "a", "DeletedAccount"):
+                # Building and compiling only, without the round trip to the database
+                start = time.perf_counter()
+                for _ in range(NUMBER):
+                    backend._compile(build())
+                report(f"{name}, compile, sqlalchemy", time.perf_counter() - start, NUMBER, "query")
+
+                compiled = query.compile()
+                start = time.perf_counter()
+                for _ in range(NUMBER):
+                    query._args(compiled, values)
+                report(f"{name}, compile, compiled", time.perf_counter() - start, NUMBER, "query")
+
+                start = time.perf_counter()
+                for _ in range(NUMBER):
+                    await db.fetch_all(build())
+                report(f"{name}, run, sqlalchemy", time.perf_counter() - start, NUMBER, "query")
+
+                start = time.perf_counter()
+                for _ in range(NUMBER):
+                    await query.fetch_all(**values)
+                report(f"{name}, run, compiled", time.perf_counter() - start, NUMBER, "query")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
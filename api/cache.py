@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+__all__ = ["LRUCache"]
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    In-process cache evicting the least recently used entries.
+    The size is the sum of the entries' weights, 1 per entry unless a `weigh` function is given.
+    Entries can also expire after `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None, weigh: Callable[[V], int] | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigh = weigh
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[K, tuple[V, float | None, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: K, count: bool = True) -> V | None:
+        if (entry := self._entries.get(key)) is not None:
+            value, expires, _ = entry
+            if expires is None or expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += count
+                return value
+
+            self.pop(key)
+
+        self.misses += count
+        return None
+
+    def set(self, key: K, value: V):
+        self.pop(key)
+
+        weight = 1 if self.weigh is None else self.weigh(value)
+        if weight > self.maxsize:
+            return
+
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        self._entries[key] = value, expires, weight
+        self.size += weight
+
+        while self.size > self.maxsize:
+            _, (_, _, weight) = self._entries.popitem(last=False)
+            self.size -= weight
+            self.evictions += 1
+
+    def pop(self, key: K) -> V | None:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self.size -= entry[2]
+            return entry[0]
+
+    def evict(self, predicate: Callable[[V], bool]):
+        """Remove all the entries whose value matches the predicate."""
+        for key in [key for key, (value, _, _) in self._entries.items() if predicate(value)]:
+            self.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,42 @@
+"""
+Export the pages with their ordered blocks from the command line, inside the api container:
+`python -m api.export --format ndjson.gz -o notes.ndjson.gz`
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from api.models.base import read_db
+from api.models.export import ExportFilters, ExportStats, export
+
+
+async def main():
+    parser = argparse.ArgumentParser(prog="python -m api.export", description="Export the pages and their blocks.")
+    parser.add_argument("-o", "--output", help="file to write, the standard output by default")
+    parser.add_argument("-f", "--format", choices=("ndjson", "ndjson.gz"), default="ndjson")
+    parser.add_argument("--author", type=int, help="only export the pages of this user id")
+    parser.add_argument(
+        "--active", action=argparse.BooleanOptionalAction, help="only export the active/archived pages"
+    )
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only export the pages edited since this date")
+    args = parser.parse_args()
+
+    filters = ExportFilters(author=args.author, active=args.active, since=args.since)
+    stats = ExportStats()
+    output = sys.stdout.buffer if args.output is None else open(args.output, "wb")
+    # The export only reads, from the replica when there is one
+    await read_db.connect()
+    try:
+        async for chunk in export(filters, args.format, stats):
+            output.write(chunk)
+    finally:
+        await read_db.disconnect()
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    print(f"Exported {stats}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
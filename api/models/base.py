@@ -1,4 +1,5 @@
 import os
+from contextvars import ContextVar
 from typing import Literal
 
 from databases import Database
@@ -8,7 +9,58 @@ from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import ClauseElement, Executable
 from sqlalchemy.sql.compiler import StrSQLCompiler
 
-db = Database(os.environ["DATABASE_URL"])
+from .constant import (
+    DATABASE_ACQUIRE_TIMEOUT,
+    DATABASE_POOL_MAX_SIZE,
+    DATABASE_POOL_MIN_SIZE,
+    DATABASE_STATEMENT_TIMEOUT,
+)
+from .pool import InstrumentedPool
+
+
+class PooledDatabase(Database):
+    """`Database` whose connections come from an `InstrumentedPool`."""
+
+    async def connect(self):
+        await super().connect()
+        self._backend._pool = InstrumentedPool(self._backend._pool, DATABASE_ACQUIRE_TIMEOUT / 1000 or None)
+
+    @property
+    def pool(self) -> InstrumentedPool | None:
+        return self._backend._pool
+
+
+def _database(url: str) -> PooledDatabase:
+    return PooledDatabase(
+        url,
+        min_size=DATABASE_POOL_MIN_SIZE,
+        max_size=DATABASE_POOL_MAX_SIZE,
+        server_settings={"statement_timeout": str(DATABASE_STATEMENT_TIMEOUT)},
+    )
+
+
+db = _database(os.environ["DATABASE_URL"])
+# Replica serving the read-only queries, the primary itself when there is none
+read_db = _database(url) if (url := os.getenv("DATABASE_READ_URL")) else db
+# Whether the reads of the current request must see its writes, or the recent writes of its client
+_primary: ContextVar[bool] = ContextVar("primary", default=False)
+
+
+def reader() -> PooledDatabase:
+    """The database to run a read-only query on: the replica, unless the reads must stick to the primary."""
+    return db if _primary.get() else read_db
+
+
+def sticks_to_primary() -> bool:
+    """Whether the reads of the current request go to the primary, while a replica serves the others."""
+    return _primary.get() and read_db is not db
+
+
+def stick_to_primary():
+    """Read from the primary for the rest of the current request (its task and the ones it starts)."""
+    _primary.set(True)
+
+
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 TempBase = declarative_base()
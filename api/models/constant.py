@@ -0,0 +1,34 @@
+import os
+
+__all__ = [
+    "BLOCK_STUB_SIZE",
+    "DATABASE_ACQUIRE_TIMEOUT",
+    "DATABASE_POOL_MAX_SIZE",
+    "DATABASE_POOL_MIN_SIZE",
+    "DATABASE_READ_STICKINESS",
+    "DATABASE_STATEMENT_TIMEOUT",
+    "PAGE_CACHE_MAX_BLOCKS",
+    "PAGE_CACHE_SIZE",
+    "PAGE_EDITED_DELAY",
+]
+
+# Connections kept open by the pool of each worker. All the workers together must stay under `max_connections`
+DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", 10))
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", 10))
+# Time a request waits for a free connection of the pool before failing with a 503, in milliseconds. 0 waits forever
+DATABASE_ACQUIRE_TIMEOUT = float(os.getenv("DATABASE_ACQUIRE_TIMEOUT", 10_000))
+# Time after which PostgreSQL cancels a statement, in milliseconds. 0 disables it, the exports can run for long
+DATABASE_STATEMENT_TIMEOUT = int(os.getenv("DATABASE_STATEMENT_TIMEOUT", 0))
+# Seconds during which a client that wrote reads from the primary, for the replica to replay its changes
+DATABASE_READ_STICKINESS = float(os.getenv("DATABASE_READ_STICKINESS", 5))
+
+# Number of blocks kept in memory by the page content cache of each worker, 0 disables the cache
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", 100_000))
+# Pages with more blocks are never cached, their slices are always read from the database
+PAGE_CACHE_MAX_BLOCKS = int(os.getenv("PAGE_CACHE_MAX_BLOCKS", 5_000))
+# Time during which the changes of a page are gathered in memory before writing `pages.edited`, in milliseconds.
+# The other workers see the changes (and the cached contents get fresh) this late at most. 0 writes every change.
+PAGE_EDITED_DELAY = float(os.getenv("PAGE_EDITED_DELAY", 500))
+# Blocks whose data is larger than this number of bytes are listed without it, as a stub with its size and hash.
+# Their data is fetched with the block itself, or by asking the listing for the payloads.
+BLOCK_STUB_SIZE = int(os.getenv("BLOCK_STUB_SIZE", 16 * 1024))
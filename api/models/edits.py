@@ -0,0 +1,106 @@
+"""
+Write-behind of `pages.edited`.
+
+Every change to the blocks of a page marks it as edited. Instead of updating the row of the page with each change,
+which makes it a lock hotspot when many clients edit the same page, the pages are marked as dirty in memory and
+written in batches, at most `delay` seconds after their first change.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+
+from databases import Database
+
+from .base import db
+
+__all__ = ["EditedWriter"]
+
+
+class EditedWriter:
+    """
+    Coalesce the `pages.edited` updates of a worker.
+    `edited` gets the time of the last change of the page, not the time of the flush. It is always moved forward,
+    so that the workers checking their cache against it notice the changes of the others, `delay` seconds late at most.
+    With a delay of 0, every change is written right away.
+    """
+
+    def __init__(self, delay: float, database: Database = db):
+        self.delay = delay
+        self.database = database
+        # Page id -> monotonic time of its last change
+        self.dirty: dict[int, float] = {}
+        self.handle: asyncio.TimerHandle | None = None
+        self.task: asyncio.Task | None = None
+        self.flushes = 0
+        self.pages = 0
+        self.changes = 0
+
+    async def touch(self, page_id: int):
+        """Mark the page as edited now."""
+        self.changes += 1
+        self.dirty[page_id] = time.monotonic()
+        if self.delay <= 0:
+            await self.flush()
+        elif self.handle is None:
+            self.handle = asyncio.get_running_loop().call_later(self.delay, self._flush_later)
+
+    def _flush_later(self):
+        self.handle = None
+        self.task = asyncio.create_task(self._flush_logged())
+
+    async def _flush_logged(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Couldn't write the edition time of the pages, retrying in {self.delay}s: {e!r}")
+
+    async def flush(self):
+        """Write the edition time of the dirty pages, in a single statement."""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        if not self.dirty:
+            return
+
+        dirty, self.dirty = self.dirty, {}
+        # Same order on every worker, so that two flushes cannot deadlock
+        ids = sorted(dirty)
+        now = time.monotonic()
+        try:
+            await self.database.execute(
+                """
+            UPDATE pages
+                SET edited = GREATEST(
+                    LOCALTIMESTAMP - make_interval(secs => dirty.age), edited + interval '1 microsecond'
+                )
+            FROM unnest(CAST(:ids AS integer[]), CAST(:ages AS float8[])) AS dirty(id, age)
+            WHERE pages.id = dirty.id;""",
+                {"ids": ids, "ages": [now - dirty[page_id] for page_id in ids]},
+            )
+        except Exception:
+            # Keep the pages for the next flush, without overriding the changes made since
+            for page_id, changed in dirty.items():
+                self.dirty.setdefault(page_id, changed)
+            if self.handle is None and self.delay > 0:
+                self.handle = asyncio.get_running_loop().call_later(self.delay, self._flush_later)
+            raise
+
+        self.flushes += 1
+        self.pages += len(ids)
+
+    async def stop(self):
+        """Write the pending changes, when the worker shuts down."""
+        if self.task is not None:
+            await self.task
+            self.task = None
+
+        await self.flush()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "dirty": len(self.dirty),
+            "changes": self.changes,
+            "flushes": self.flushes,
+            "pages_written": self.pages,
+        }
@@ -0,0 +1,118 @@
+"""
+Export of the pages with their ordered blocks, to back up or migrate the notes.
+
+The export is newline-delimited JSON: a `{"page": ...}` line, followed by a `{"block": ...}` line per block of the
+page.
+Rows are read through a server-side cursor and written as they come, so the memory used does not depend on the size
+of the database.
+"""
+from __future__ import annotations
+
+import time
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Literal
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from .base import reader
+from .page import DBBlock, DBPage, block_json
+
+__all__ = ["ExportFilters", "ExportStats", "Format", "export"]
+
+Format = Literal["ndjson", "ndjson.gz"]
+# Size of the chunks written, lines are buffered until there is this many bytes
+CHUNK_SIZE = 64 * 1024
+
+PAGE_FIELDS = ("id", "title", "author", "created", "edited", "active")
+# Block columns, by name in the export
+BLOCK_FIELDS = {"id": "block_id", "page_id": "page_id", "sequence": "sequence", "type": "type"}
+
+
+class ExportFilters(BaseModel):
+    author: int | None = None
+    active: bool | None = None
+    # Only the pages edited since then
+    since: datetime | None = None
+
+
+class ExportStats(BaseModel):
+    pages: int = 0
+    blocks: int = 0
+    # Size of the export, after compression
+    bytes: int = 0
+    seconds: float = 0
+
+    def __str__(self) -> str:
+        seconds = self.seconds or float("inf")
+        return (
+            f"{self.pages:,} pages and {self.blocks:,} blocks ({self.bytes / 1e6:,.1f} MB) in {self.seconds:.1f}s:"
+            f" {self.blocks / seconds:,.0f} blocks/s, {self.bytes / 1e6 / seconds:,.1f} MB/s"
+        )
+
+
+def _query(filters: ExportFilters) -> Select:
+    query = (
+        select(*(DBPage.__table__.c[field] for field in PAGE_FIELDS))
+        .add_columns(DBBlock.id.label("block_id"), DBBlock.page_id, DBBlock.sequence, DBBlock.type, DBBlock.data)
+        .select_from(DBPage)
+        .outerjoin(DBBlock, DBBlock.page_id == DBPage.id)
+        .order_by(DBPage.id, DBBlock.sequence)
+    )
+    if filters.author is not None:
+        query = query.where(DBPage.author == filters.author)
+    if filters.active is not None:
+        query = query.where(DBPage.active == filters.active)
+    if filters.since is not None:
+        query = query.where(DBPage.edited >= filters.since)
+
+    return query
+
+
+async def _lines(filters: ExportFilters, stats: ExportStats) -> AsyncIterator[bytes]:
+    page_id = None
+    async for row in reader().iterate(_query(filters)):
+        row = row._mapping
+        if row["id"] != page_id:
+            page_id = row["id"]
+            stats.pages += 1
+            yield b'{"page":%s}\n' % orjson.dumps({field: row[field] for field in PAGE_FIELDS})
+
+        # No block for a page without any
+        if row["block_id"] is not None:
+            stats.blocks += 1
+            fields = {name: row[column] for name, column in BLOCK_FIELDS.items()}
+            yield b'{"block":%s}\n' % block_json(fields, row["data"])
+
+
+async def export(
+    filters: ExportFilters, format: Format = "ndjson", stats: ExportStats | None = None
+) -> AsyncIterator[bytes]:
+    """Yield the export in chunks of about `CHUNK_SIZE` bytes, compressed with gzip for `ndjson.gz`."""
+    stats = ExportStats() if stats is None else stats
+    start = time.perf_counter()
+    compressor = zlib.compressobj(wbits=31) if format == "ndjson.gz" else None
+
+    def output(data: bytes, last: bool = False) -> bytes:
+        if compressor is not None:
+            data = compressor.compress(data) + (compressor.flush() if last else b"")
+
+        stats.bytes += len(data)
+        return data
+
+    buffer = bytearray()
+    async for line in _lines(filters, stats):
+        buffer += line
+        if len(buffer) >= CHUNK_SIZE:
+            if chunk := output(bytes(buffer)):
+                yield chunk
+
+            buffer.clear()
+
+    if chunk := output(bytes(buffer), last=True):
+        yield chunk
+
+    stats.seconds = time.perf_counter() - start
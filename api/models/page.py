@@ -1,33 +1,65 @@
 from __future__ import annotations
 
+import bisect
+import functools
+import random
 from datetime import datetime
-from typing import Awaitable
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Literal, Mapping, Union
 
-from pydantic import BaseModel, constr
+import orjson
+from asyncpg.exceptions import DeadlockDetectedError, UniqueViolationError
+from pydantic import BaseModel, Field, constr, root_validator
 from sqlalchemy import (
     Boolean,
     Column,
+    Computed,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
+    bindparam,
+    case,
     delete,
     insert,
-    literal_column,
+    literal,
+    null,
     select,
     true,
+    tuple_,
     update,
 )
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import aliased
-from sqlalchemy.sql import func
+from sqlalchemy.sql import Select, func
+from sqlalchemy.sql.dml import Delete, Insert, Update
 
-from .base import Base, TempBase, create_table_as, db
+from api.cache import LRUCache
+
+from .base import Base, db, reader, sticks_to_primary
+from .constant import BLOCK_STUB_SIZE, PAGE_CACHE_MAX_BLOCKS, PAGE_CACHE_SIZE, PAGE_EDITED_DELAY
+from .edits import EditedWriter
+from .patch import merge_patch, merge_patch_expression
+from .queries import Query
+from .rank import generate_n_keys_between
 from .user import User
 
-ONE = literal_column("1")
-SEQUENCE_STEP = 256
+# Number of times a block is given a new rank key when a concurrent insertion took the same one
+INSERT_ATTEMPTS = 10
+# Inserting at the same position makes the keys grow. Past this length, the blocks around the position are respaced
+MAX_KEY_LENGTH = 32
+# Length the keys of a respaced window must fit in, the window grows until they do
+REBALANCED_KEY_LENGTH = MAX_KEY_LENGTH // 2
+
+
+# Pages whose `edited` date is waiting to be written
+edits = EditedWriter(PAGE_EDITED_DELAY / 1000)
+
+# Blocks of the pages recently read, with the `edited` date of the page they were read at. Weighted by blocks.
+# The pages too long to be cached have no blocks, their slices are read from the database
+contents: LRUCache[int, tuple[datetime, list["Block"] | None]] = LRUCache(
+    PAGE_CACHE_SIZE, weigh=lambda entry: len(entry[1] or ()) + 1
+)
 
 
 class PageNotFound(Exception):
@@ -36,8 +68,35 @@ class PageNotFound(Exception):
         super().__init__(f"Page id {page} does not exists.")
 
 
+class PageArchived(Exception):
+    def __init__(self, page: int):
+        self.page = page
+        super().__init__(f"Page id {page} is archived.")
+
+
+class BlockNotFound(Exception):
+    def __init__(self, page: int, block: str):
+        self.page = page
+        self.block = block
+        super().__init__(f"Block id {block} does not exists in page {page}.")
+
+
+class BlockExists(Exception):
+    def __init__(self, page: int, block: str):
+        self.page = page
+        self.block = block
+        super().__init__(f"Block id {block} already exists in page {page}.")
+
+
 class DBPage(Base):
     __tablename__ = "pages"
+    # The listings, from the most recent pages, see `Page.get_slice`
+    __table_args__ = (
+        Index("pages_edited_id_idx", "edited", "id"),
+        Index("pages_created_id_idx", "created", "id"),
+        Index("pages_author_edited_id_idx", "author", "edited", "id"),
+        Index("pages_author_created_id_idx", "author", "created", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String(50), nullable=False)
@@ -49,20 +108,31 @@ class DBPage(Base):
 
 class DBBlock(Base):
     __tablename__ = "blocks"
+    # Its index also INCLUDEs the id of the blocks, see the migrations
     __table_args__ = (UniqueConstraint("page_id", "sequence", deferrable=True),)
 
     id = Column(String(10), primary_key=True, nullable=False)
     page_id = Column(Integer, ForeignKey("pages.id"), primary_key=True, nullable=False)
-    sequence = Column(Integer, nullable=False)
+    # Rank key, see `rank.py`. Compared byte per byte so that the database sorts them like Python does
+    sequence = Column(String(collation="C"), nullable=False)
     type = Column(String(16), nullable=False)
+    # The large data are stored compressed out of the row (TOAST), see `toast_tuple_target` in the migrations
     data = Column(JSONB, nullable=False)
+    # Size in bytes and md5 of the data as JSON, so that the listings can describe the data without reading it
+    size = Column(Integer, Computed("octet_length(data::text)"), nullable=False)
+    hash = Column(String(32), Computed("md5(data::text)"), nullable=False)
 
 
-class BlockFlatten(TempBase):
-    __tablename__ = "block_flatten"
-
-    id = Column(String(10), primary_key=True, nullable=False)
-    seq = Column(Integer, nullable=False)
+# The reads of the hot paths, compiled once
+_page_by_id = DBPage.id == bindparam("page_id")
+_block_by_id = (DBBlock.page_id == bindparam("page_id")) & (DBBlock.id == bindparam("block_id"))
+GET_PAGE = Query(select(DBPage).where(_page_by_id))
+PAGE_ACTIVE = Query(select(DBPage.active).where(_page_by_id))
+PAGE_EXISTS = Query(select(true()).where(_page_by_id))
+# Read with the blocks of the page, from the same database for the cached content to match its date
+PAGE_EDITED = Query(select(DBPage.edited).where(_page_by_id), read_only=True)
+GET_BLOCK = Query(select(DBBlock).where(_block_by_id))
+BLOCK_SEQUENCE = Query(select(DBBlock.sequence).where(_block_by_id))
 
 
 class PageCreation(BaseModel):
@@ -73,6 +143,20 @@ class PageCreation(BaseModel):
         return Page(**await db.fetch_one(query))
 
 
+PageOrder = Literal["edited", "created"]
+
+
+class PageFields(BaseModel):
+    """A page with only some of its fields, see `Page.get_slice`."""
+
+    id: int | None
+    title: str | None
+    author: int | None
+    created: datetime | None
+    edited: datetime | None
+    active: bool | None
+
+
 class Page(BaseModel):
     id: int
     title: str
@@ -83,17 +167,16 @@ class Page(BaseModel):
 
     @staticmethod
     async def is_archived(page_id: int) -> bool:
-        return not await db.fetch_val(select(DBPage.active).where(DBPage.id == page_id))
+        return not await PAGE_ACTIVE.fetch_val(page_id=page_id)
 
     @classmethod
     def exists(cls, page_id: int) -> Awaitable[bool]:
-        return db.fetch_val(select(true()).where(DBPage.id == page_id))
+        return PAGE_EXISTS.fetch_val(page_id=page_id)
 
     @classmethod
     async def get(cls, id: int, user: User) -> Page | None:
         # TODO: Check for permissions
-        query = select(DBPage).where(DBPage.id == id)
-        return cls(**await db.fetch_one(query))
+        return cls(**await GET_PAGE.fetch_one(page_id=id))
 
     @classmethod
     async def update(cls, page_id: int, page: PageCreation, user: User) -> Page | None:
@@ -104,11 +187,15 @@ class Page(BaseModel):
 
     @classmethod
     async def updated(cls, page_id: int):
-        await db.execute(update(DBPage).values(edited=func.now()).where(DBPage.id == page_id))
+        """Mark the content of the page as changed. Every change to the blocks of a page goes through here."""
+        if (entry := contents.get(page_id, count=False)) is not None and entry[1] is not None:
+            contents.pop(page_id)
+        await edits.touch(page_id)
 
     @classmethod
     async def delete(cls, id: int, user: User) -> Page | None:
         if page := await db.fetch_one(delete(DBPage).where(DBPage.id == id).returning(DBPage)):
+            contents.pop(id)
             return cls(**page)
 
     @classmethod
@@ -118,36 +205,71 @@ class Page(BaseModel):
         ):
             return cls(**page)
 
+    @staticmethod
+    @functools.cache
+    def _slice(order: PageOrder, columns: tuple[str, ...], after: bool, author: bool, active: bool) -> Query:
+        """
+        The query of a range of pages, one per shape: the order, the columns, and whether it starts after a page and
+        filters on the author and the state. Run it with the `size` of the range, the `after` date and `after_id` of
+        the page before, and the `author` and `active` to filter on.
+        """
+        # Keyset pagination, served by the indexes on (edited, id) and (created, id), with the author first or not
+        key = getattr(DBPage, order)
+        query = select(*(getattr(DBPage, column) for column in columns))
+        if after:
+            last = tuple_(bindparam("after", type_=DateTime), bindparam("after_id", type_=Integer))
+            query = query.where(tuple_(key, DBPage.id) < last)
+        if author:
+            query = query.where(DBPage.author == bindparam("author"))
+        if active:
+            query = query.where(DBPage.active == bindparam("active"))
+
+        query = query.order_by(key.desc(), DBPage.id.desc()).limit(bindparam("size", type_=Integer))
+        return Query(query, read_only=True)
+
     @classmethod
-    async def get_all(cls, author: User | None) -> list[Page]:
-        """Return a list of all pages created by a user"""
-        query = select(DBPage)
-        if author is not None:
-            query = query.where(DBPage.author == author.id)
+    async def get_slice(
+        cls,
+        order: PageOrder = "edited",
+        after: tuple[datetime, int] | None = None,
+        size: int = 100,
+        author: int | None = None,
+        active: bool | None = None,
+        fields: set[str] | None = None,
+    ) -> tuple[list[dict[str, Any]], tuple[datetime, int] | None]:
+        """
+        Return a range of pages, the most recently edited or created first, with only the given `fields`, all of them
+        by default. Also return the key of the last page, to pass as `after` to get the next range, None if there is no
+        more pages.
+        """
+        fields = set(cls.__fields__) if fields is None else fields
+        # The key of the last page is read even if its fields are not returned
+        columns = tuple(name for name in cls.__fields__ if name in fields or name in ("id", order))
+        query = cls._slice(order, columns, after is not None, author is not None, active is not None)
+        after_key, after_id = (None, None) if after is None else after
+        rows = await query.fetch_all(size=size, after=after_key, after_id=after_id, author=author, active=active)
 
-        return [cls(**u) for u in await db.fetch_all(query)]
+        pages = [{name: row[name] for name in columns if name in fields} for row in rows]
+        last = (rows[-1][order], rows[-1]["id"]) if len(rows) == size else None
+        return pages, last
 
-    @classmethod
-    @db.transaction()
-    async def _flatten(cls, page_id: int):
-        # similar to enumerate(rows)
-        seq = func.row_number().over(order_by=DBBlock.sequence) * SEQUENCE_STEP
 
-        # Create a temporary table that holds the flattened sequences
-        await db.execute(
-            create_table_as(
-                BlockFlatten,
-                select(DBBlock.id.label("id"), seq.label("seq")).where(DBBlock.page_id == page_id),
-                temp=True,
-                on_commit="DROP",
-            )
-        )
-        # Then update the sequences on the real table
-        await db.execute(
-            update(DBBlock)
-            .values(sequence=BlockFlatten.seq)
-            .where(DBBlock.page_id == page_id, DBBlock.id == BlockFlatten.id)
-        )
+# The single-statement writes are built on the tables
+page_table = DBPage.__table__
+block_table = DBBlock.__table__
+
+
+def block_json(fields: Mapping[str, Any], data: str | None) -> bytes:
+    """
+    JSON object of a block read as a raw row, which holds `data` as the JSON text sent by PostgreSQL: it is copied as
+    is instead of being parsed and serialized again. The `data` of a stub is None, written as null.
+    """
+    return b'%s,"data":%s}' % (orjson.dumps(fields)[:-1], b"null" if data is None else data.encode())
+
+
+def _active_page(page_id: int) -> Select:
+    """The id of the page if it is active, to restrict a write to the blocks of an active page."""
+    return select(page_table.c.id).where(page_table.c.id == page_id, page_table.c.active)
 
 
 BlockId = constr(max_length=10)
@@ -163,152 +285,562 @@ class BlockCreation(BaseModel):
 class BlockUpdate(BaseModel):
     type: BlockType | None
     data: dict | None
+    # JSON merge-patch of the data, to only send the changed fields instead of the whole data
+    patch: dict | None
+
+    @root_validator(skip_on_failure=True)
+    def data_or_patch(cls, values: dict) -> dict:
+        if values.get("data") is not None and values.get("patch") is not None:
+            raise ValueError("Either the data or a patch can be given, not both")
+
+        return values
+
+
+class BlockAddOperation(BlockCreation):
+    op: Literal["add"]
+    id: BlockId
+
+
+class BlockUpdateOperation(BlockUpdate):
+    op: Literal["update"]
+    id: BlockId
+
+
+class BlockDeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: BlockId
+
+
+class BlockMoveOperation(BaseModel):
+    op: Literal["move"]
+    id: BlockId
+    before: BlockId | None = None
+
+
+BlockOperation = Annotated[
+    Union[BlockAddOperation, BlockUpdateOperation, BlockDeleteOperation, BlockMoveOperation],
+    Field(discriminator="op"),
+]
+
+
+class BatchResult(BaseModel):
+    """Ids of the blocks changed by a batch. A block deleted then added again appears in both lists."""
+
+    added: list[BlockId] = []
+    modified: list[BlockId] = []
+    deleted: list[BlockId] = []
+    moved: list[BlockId] = []
 
 
 class Block(BaseModel):
     id: BlockId
     page_id: int
     type: BlockType
-    data: dict
-    sequence: int
+    # None in the listings when the data is larger than `BLOCK_STUB_SIZE`: the block is only a stub
+    data: dict | None
+    sequence: str
+    size: int
+    hash: str
 
     @classmethod
     async def get(cls, page_id: int, id_: BlockId) -> Block | None:
         """Get a single block from the database."""
-        if block := await db.fetch_one(select(DBBlock).where(DBBlock.page_id == page_id, DBBlock.id == id_)):
+        if block := await GET_BLOCK.fetch_one(page_id=page_id, block_id=id_):
             return cls(**block)
 
     @classmethod
     async def delete(cls, page_id: int, block_id: BlockId) -> Block | None:
         """Delete a single block from the database."""
-        if block := await db.fetch_one(
-            delete(DBBlock).where(DBBlock.page_id == page_id, DBBlock.id == block_id).returning(DBBlock)
-        ):
-            await Page.updated(page_id)
-            return cls(**block)
+        return await cls._write(
+            page_id,
+            delete(block_table).where(block_table.c.id == block_id, block_table.c.page_id.in_(_active_page(page_id))),
+        )
 
     @classmethod
-    async def get_slice(cls, page_id: int, from_: BlockId | None, size: int = 25) -> list[Block]:
-        """Return a range of blocks for a given page. To get the next range of blocks, call it with the last block's id."""
-        if from_ is None:
-            query = select(DBBlock).where(DBBlock.page_id == page_id)
-        else:
-            start = aliased(DBBlock)
-            query = (
-                select(DBBlock)
-                .join(start, start.page_id == DBBlock.page_id)
-                .where(
-                    start.id == from_,
-                    start.page_id == page_id,
-                    DBBlock.sequence > start.sequence,
-                )
-            )
+    async def _write(cls, page_id: int, query: Insert | Update | Delete) -> Block | None:
+        """
+        Run a write on a block, checking the state of its page in the same statement, and mark the page as edited.
+        The query must only affect the blocks of an active page, see `_active_page`.
+        Return the block written, None if there was none.
+        :raises PageNotFound: the page does not exists
+        :raises PageArchived: the page is archived
+        """
+        page = select(page_table.c.id, page_table.c.active).where(page_table.c.id == page_id).cte("page")
+        written = query.returning(*block_table.c).cte("written")
+        row = await db.fetch_one(select(page.c.active, *written.c).select_from(page.outerjoin(written, true())))
 
-        if size > 0:
-            query = query.limit(size)
+        if row is None:
+            raise PageNotFound(page_id)
 
-        return [cls(**b) for b in await db.fetch_all(query.order_by(DBBlock.sequence))]
+        # SQLAlchemy 1.4 also maps the columns returned inside the CTEs, which shifts the result map:
+        # read the record as returned by asyncpg, with the jsonb as text
+        row = row._mapping
+        if not row["active"]:
+            raise PageArchived(page_id)
+        if row["id"] is None:
+            return None
+
+        await Page.updated(page_id)
+        return cls(**{**row, "data": orjson.loads(row["data"])})
+
+    @staticmethod
+    @functools.cache
+    def _slice(after: bool, limit: bool, payloads: bool) -> Query:
+        """
+        The query of a range of blocks, one per shape: with or without a start sequence, a limit and the payloads.
+        Run it with the `page_id`, and the `after` sequence and `size` of the range when the shape has them.
+        """
+        # Keyset pagination, served by the (page_id, sequence) unique index
+        data = DBBlock.data
+        if not payloads:
+            # The large data are not even read from their TOAST table
+            data = case((DBBlock.size <= BLOCK_STUB_SIZE, DBBlock.data), else_=null()).label("data")
+
+        query = select(
+            DBBlock.id, DBBlock.page_id, DBBlock.type, data, DBBlock.sequence, DBBlock.size, DBBlock.hash
+        ).where(DBBlock.page_id == bindparam("page_id"))
+        if after:
+            query = query.where(DBBlock.sequence > bindparam("after"))
+
+        if limit:
+            query = query.limit(bindparam("size", type_=Integer))
+
+        return Query(query.order_by(DBBlock.sequence), read_only=True)
+
+    @classmethod
+    async def get_slice(
+        cls, page_id: int, after: str | None = None, size: int = 25, payloads: bool = False
+    ) -> list[Block]:
+        """
+        Return a range of blocks for a given page, starting after the sequence `after`.
+        To get the next range of blocks, call it with the last block's sequence. A size of 0 or less returns them all.
+        The large blocks are stubs without their data, unless the `payloads` are asked for.
+        """
+        if payloads or (blocks := await cls.content(page_id)) is None:
+            query = cls._slice(after is not None, size > 0, payloads)
+            return [cls(**b) for b in await query.fetch_all(page_id=page_id, after=after, size=size)]
+
+        start = 0 if after is None else bisect.bisect_right(blocks, after, key=lambda block: block.sequence)
+        end = start + size if size > 0 else None
+        return blocks[start:end]
+
+    @classmethod
+    async def content(cls, page_id: int) -> list[Block] | None:
+        """
+        Return all the blocks of a page, the large ones as stubs, from the cache when it is up to date.
+        None if the slices of the page must be read from the database instead: the cache is disabled, the reads stick
+        to the primary, or the page is too long to be cached. The cache is checked against `pages.edited`, so that the
+        changes made by the other workers are seen as well.
+        The returned blocks are shared, they must not be modified.
+        """
+        # Filled from the replica too, the cache may miss the writes that the reads sticking to the primary must see:
+        # `edited` is written behind them, so it does not tell
+        if contents.maxsize <= 0 or sticks_to_primary():
+            return None
+
+        # A page known to be too long stays so through its changes, until it is evicted
+        if (entry := contents.get(page_id, count=False)) is not None and entry[1] is None:
+            return None
+
+        # Read before the blocks: if they change in between, the cached version is already outdated
+        edited = await PAGE_EDITED.fetch_val(page_id=page_id)
+        if edited is None:
+            return []
+
+        if entry is not None and entry[0] == edited:
+            contents.hits += 1
+            return entry[1]
+
+        contents.misses += 1
+        rows = await cls._slice(False, True, False).fetch_all(page_id=page_id, size=PAGE_CACHE_MAX_BLOCKS + 1)
+        blocks = [cls(**row) for row in rows] if len(rows) <= PAGE_CACHE_MAX_BLOCKS else None
+        contents.set(page_id, (edited, blocks))
+        return blocks
+
+    @classmethod
+    def iterate_slice(
+        cls, page_id: int, after: str | None = None, size: int = 0, payloads: bool = False
+    ) -> AsyncIterator[Mapping]:
+        """Same as `get_slice`, but yield the raw rows as they are read from the database."""
+        # Iterating needs a cursor, which `Query` does not handle: the statement is compiled again
+        query = cls._slice(after is not None, size > 0, payloads).statement
+        return reader().iterate(query.params(page_id=page_id, after=after, size=size))
+
+    @classmethod
+    async def sequence_of(cls, page_id: int, block_id: BlockId) -> str | None:
+        return await BLOCK_SEQUENCE.fetch_val(page_id=page_id, block_id=block_id)
 
     @classmethod
     async def add(cls, page_id: int, block_id: BlockId, data: BlockCreation) -> Block:
         """
-        Add a block to the page. Append it to the end if no sequence number is given.
-        Otherwise, it will insert the block in the page and increment the sequence of all subsequent blocks.
+        Add a block to the page. Append it to the end if no `before` block is given.
+        Otherwise, it will insert the block right before this one.
         """
 
+        columns = block_table.c
         return await cls._insert(
             page_id,
             data.before,
-            insert(DBBlock).returning(DBBlock),
-            page_id=page_id,
-            id=block_id,
-            **data.dict(exclude={"before"}),
+            lambda sequence: insert(block_table).from_select(
+                ["id", "page_id", "sequence", "type", "data"],
+                select(
+                    literal(block_id, columns.id.type),
+                    page_table.c.id,
+                    literal(sequence, columns.sequence.type),
+                    literal(data.type, columns.type.type),
+                    literal(data.data, columns.data.type),
+                ).where(page_table.c.id == page_id, page_table.c.active),
+            ),
         )
 
     @classmethod
-    async def _insert(cls, page_id: int, before: BlockId | None, query: insert | update, /, **kwargs) -> Block | None:
-        if not await Page.exists(page_id):
-            raise PageNotFound(page_id)
-
-        if before is None:
+    async def _neighbours(cls, page_id: int, before: BlockId | None) -> tuple[str | None, str | None]:
+        """
+        Return the rank keys surrounding the position right before the block `before`, or the end of the page.
+        The state of the page is read along, in the same query.
+        :raises PageNotFound: the page does not exists
+        :raises PageArchived: the page is archived
+        """
+        if before is not None:
             sequence = (
-                select(SEQUENCE_STEP * (func.div(DBBlock.sequence, SEQUENCE_STEP) + 1))
-                .where(DBBlock.page_id == page_id)
+                select(DBBlock.sequence).where(DBBlock.page_id == page_id, DBBlock.id == before).scalar_subquery()
+            )
+            keys = (
+                select(DBBlock.sequence)
+                .where(DBBlock.page_id == page_id, DBBlock.sequence <= sequence)
                 .order_by(DBBlock.sequence.desc())
-                .limit(1)
-                .as_scalar()
+                .limit(2)
+                .lateral("keys")
             )
-            block = await db.fetch_one(query.values(sequence=func.coalesce(sequence, 0), **kwargs))
-        else:
-            async with db.transaction():
-                sequences: list[int] = [
-                    s.sequence
-                    for s in await db.fetch_all(
-                        select(DBBlock.sequence)
-                        .where(DBBlock.page_id == page_id, DBBlock.id <= before)
-                        .order_by(DBBlock.sequence.desc())
-                        .limit(2)
-                    )
-                ]
-
-                if len(sequences) == 1:
-                    sequence = SEQUENCE_STEP * (sequences[0] // SEQUENCE_STEP - 1)
-                else:
-                    bbseq, bseq = sequences
-                    if abs(bseq - bbseq) <= 1:
-                        await Page._flatten(page_id)
-                    else:
-                        sequence = (bseq + bbseq) // 2
+            rows = await db.fetch_all(
+                select(DBPage.active, keys.c.sequence)
+                .select_from(DBPage)
+                .outerjoin(keys, true())
+                .where(DBPage.id == page_id)
+                .order_by(keys.c.sequence.desc())
+            )
+            cls._check_page(page_id, rows[0] if rows else None)
+            if rows[0].sequence is not None:
+                return rows[1].sequence if len(rows) > 1 else None, rows[0].sequence
 
-                block = await db.fetch_one(query.values(sequence=sequence, **kwargs))
+        # No block to insert before, append to the end of the page
+        last = select(func.max(DBBlock.sequence)).where(DBBlock.page_id == page_id).scalar_subquery()
+        row = await db.fetch_one(select(DBPage.active, last.label("sequence")).where(DBPage.id == page_id))
+        cls._check_page(page_id, row)
+        return row.sequence, None
 
-        if block:
-            await Page.updated(page_id)
-            return cls(**block)
+    @staticmethod
+    def _check_page(page_id: int, row: Mapping | None):
+        if row is None:
+            raise PageNotFound(page_id)
+        if not row.active:
+            raise PageArchived(page_id)
+
+    @classmethod
+    async def _rebalance(cls, page_id: int, lower: str | None, upper: str | None) -> str:
+        """
+        Give short keys to the smallest window of blocks around the position between `lower` and `upper`,
+        and return the key of this position. The window doubles until its keys fit in `REBALANCED_KEY_LENGTH`.
+        Must be called in a transaction.
+        """
+        # The keys of the window are swapped with each other, the uniqueness is only checked once they are all written
+        await db.execute("SET CONSTRAINTS blocks_page_id_sequence_key DEFERRED")
+
+        size = 1
+        while True:
+            query = select(DBBlock.id, DBBlock.sequence).where(DBBlock.page_id == page_id).limit(size + 1)
+            before = []
+            if lower is not None:
+                before = await db.fetch_all(query.where(DBBlock.sequence <= lower).order_by(DBBlock.sequence.desc()))
+            after = []
+            if upper is not None:
+                after = await db.fetch_all(query.where(DBBlock.sequence >= upper).order_by(DBBlock.sequence))
+
+            # The first blocks outside of the window bound its keys
+            low = before[size].sequence if len(before) > size else None
+            high = after[size].sequence if len(after) > size else None
+            window = [row.id for row in reversed(before[:size])] + [None] + [row.id for row in after[:size]]
+            keys = generate_n_keys_between(low, high, len(window))
+            if max(map(len, keys)) <= REBALANCED_KEY_LENGTH or (low is None and high is None):
+                break
+
+            size *= 2
+
+        # The position itself has no block to update
+        position = window.index(None)
+        del window[position]
+        key = keys.pop(position)
+        await db.execute(
+            """
+        UPDATE blocks
+            SET sequence = window_.sequence
+        FROM unnest(CAST(:ids AS varchar[]), CAST(:keys AS varchar[])) AS window_(id, sequence)
+        WHERE blocks.page_id = :page_id
+            AND blocks.id = window_.id;""",
+            {
+                "page_id": page_id,
+                "ids": window,
+                "keys": keys,
+            },
+        )
+        # Check now, so that a conflict with a concurrent insertion can be retried
+        await db.execute("SET CONSTRAINTS blocks_page_id_sequence_key IMMEDIATE")
+        return key
+
+    @classmethod
+    async def _insert(
+        cls, page_id: int, before: BlockId | None, write: Callable[[str], Insert | Update]
+    ) -> Block | None:
+        """
+        Write a block with a rank key placing it before `before`, at the end of the page if it is None.
+        `write` builds the statement from the key. Only this block is written, the others keep their keys.
+        It takes two round-trips: the keys are computed here, between reading the neighbours and writing the block.
+        """
+        for attempt in range(INSERT_ATTEMPTS):
+            lower, upper = await cls._neighbours(page_id, before)
+            # After a conflict, the writers racing for the same position pick different keys
+            sequence = random.choice(generate_n_keys_between(lower, upper, 2 * attempt + 1))
+            try:
+                if len(sequence) <= MAX_KEY_LENGTH:
+                    return await cls._write(page_id, write(sequence))
+
+                async with db.transaction():
+                    return await cls._write(page_id, write(await cls._rebalance(page_id, lower, upper)))
+            except (UniqueViolationError, DeadlockDetectedError) as e:
+                # Another block got the same key in the meantime, try again with the new neighbours.
+                # As the constraint is deferrable, two transactions inserting the same key can also deadlock.
+                conflict = getattr(e, "constraint_name", None) in (None, "blocks_page_id_sequence_key")
+                if not conflict or attempt == INSERT_ATTEMPTS - 1:
+                    raise
 
     @classmethod
     async def update(cls, page_id: int, block_id: BlockId, data: BlockUpdate) -> Block | None:
-        """Update a block's type or data. To update the sequence, use `.swap` or `.move`."""
-        if block := await db.fetch_one(
-            update(DBBlock)
-            .values(**data.dict(exclude_none=True))
-            .where(DBBlock.id == block_id, DBBlock.page_id == page_id)
-            .returning(DBBlock)
-        ):
-            await Page.updated(page_id)
-            return cls(**block)
+        """
+        Update a block's type or data. To update the sequence, use `.swap` or `.move`.
+        A patch is merged into the stored data by the database.
+        """
+        values = data.dict(include={"type", "data"}, exclude_none=True)
+        if data.patch is not None:
+            values["data"] = merge_patch_expression(block_table.c.data, data.patch)
+
+        return await cls._write(
+            page_id,
+            update(block_table)
+            .values(**values or {"type": block_table.c.type})
+            .where(block_table.c.id == block_id, block_table.c.page_id.in_(_active_page(page_id))),
+        )
 
     @classmethod
-    @db.transaction()
     async def swap(cls, page_id: int, block1: BlockId, block2: BlockId):
         """
-        Swap two blocks position.
-        Throws an error if one of the block does not exists.
-        The same error is thrown if the two blocks are identicals.
+        Swap two blocks position, checking the state of the page in the same statement.
+        Nothing happens if one of the block does not exists, or if the two blocks are identicals.
+        :raises PageNotFound: the page does not exists
+        :raises PageArchived: the page is archived
         """
-        await db.execute(
+        row = await db.fetch_one(
             """
-        UPDATE blocks dst
-            SET sequence = src.sequence
-        FROM blocks src
-        WHERE dst.page_id = :page_id
-            AND src.page_id = :page_id
-            AND dst.id IN (:block1, :block2)
-            AND src.id IN (:block1, :block2)
-            AND src.id != dst.id;""",
+        WITH page AS (
+            SELECT id, active FROM pages WHERE id = :page_id
+        ), swapped AS (
+            UPDATE blocks dst
+                SET sequence = src.sequence
+            FROM blocks src, page
+            WHERE page.active
+                AND dst.page_id = page.id
+                AND src.page_id = page.id
+                AND dst.id IN (:block1, :block2)
+                AND src.id IN (:block1, :block2)
+                AND src.id != dst.id
+            RETURNING dst.id
+        )
+        SELECT active, (SELECT count(*) FROM swapped) AS swapped FROM page;""",
             {"page_id": page_id, "block1": block1, "block2": block2},
         )
-        await Page.updated(page_id)
+        cls._check_page(page_id, row)
+        if row.swapped:
+            await Page.updated(page_id)
 
     @classmethod
-    @db.transaction()
     async def move(cls, page_id: int, block_id: BlockId, before: BlockId | None) -> Block | None:
-        """Move a block's position to anywhere. Will update sequence of other blocks."""
+        """Move a block right before another one, or to the end of the page. Only the moved block is updated."""
         if block_id == before:
             return await cls.get(page_id, block_id)
 
         return await cls._insert(
             page_id,
             before,
-            update(DBBlock).where(DBBlock.page_id == page_id, DBBlock.id == block_id).returning(DBBlock),
+            lambda sequence: update(block_table)
+            .values(sequence=sequence)
+            .where(block_table.c.id == block_id, block_table.c.page_id.in_(_active_page(page_id))),
+        )
+
+    @classmethod
+    async def batch(cls, page_id: int, operations: list[BlockOperation]) -> BatchResult:
+        """
+        Apply the operations in order, as a single transaction.
+        They are first folded in memory (e.g. an added then updated block is only inserted once),
+        then written with one statement per kind of change, whatever the number of operations.
+        :raises PageNotFound: the page does not exists
+        :raises PageArchived: the page is archived
+        :raises BlockNotFound: an operation refers to a block that does not exists (anymore)
+        :raises BlockExists: a block is added with the id of another one
+        """
+        # A transaction per call: a decorator would share its state between the concurrent batches
+        async with db.transaction():
+            return await cls._batch(page_id, operations)
+
+    @classmethod
+    async def _batch(cls, page_id: int, operations: list[BlockOperation]) -> BatchResult:
+        # Also waits for the blocks being inserted in the page, as their foreign key locks it
+        page = await db.fetch_one(select(DBPage.active).where(DBPage.id == page_id).with_for_update())
+        cls._check_page(page_id, page)
+
+        rows = await db.fetch_all(
+            select(DBBlock.id, DBBlock.sequence).where(DBBlock.page_id == page_id).order_by(DBBlock.sequence)
         )
+        keys: dict[str, str] = {row.id: row.sequence for row in rows}
+        order: list[str] = list(keys)
+        added: dict[str, dict] = {}
+        modified: dict[str, dict] = {}
+        # Dicts rather than sets, to report the blocks in the order of the operations
+        deleted: dict[str, None] = {}
+        moved: dict[str, None] = {}
+
+        def index(block_id: str | None) -> int:
+            if block_id is None:
+                return len(order)
+            try:
+                return order.index(block_id)
+            except ValueError:
+                raise BlockNotFound(page_id, block_id) from None
+
+        for operation in operations:
+            block_id = operation.id
+            if isinstance(operation, BlockAddOperation):
+                if block_id in added or (block_id in keys and block_id not in deleted):
+                    raise BlockExists(page_id, block_id)
+
+                order.insert(index(operation.before), block_id)
+                added[block_id] = operation.dict(include={"type", "data"})
+                continue
+
+            position = index(block_id)
+            if isinstance(operation, BlockUpdateOperation):
+                values = operation.dict(include={"type", "data"}, exclude_none=True)
+                changes = added[block_id] if block_id in added else modified.setdefault(block_id, {})
+                if "data" in values:
+                    changes.pop("patches", None)
+                changes.update(values)
+                if operation.patch is not None:
+                    if "data" in changes:
+                        changes["data"] = merge_patch(changes["data"], operation.patch)
+                    else:
+                        # Applied to the stored data before writing
+                        changes.setdefault("patches", []).append(operation.patch)
+            elif isinstance(operation, BlockDeleteOperation):
+                del order[position]
+                if added.pop(block_id, None) is None:
+                    deleted[block_id] = None
+                    modified.pop(block_id, None)
+                    moved.pop(block_id, None)
+            elif operation.before != block_id:
+                del order[position]
+                order.insert(index(operation.before), block_id)
+                if block_id not in added:
+                    moved[block_id] = None
+
+        # Give keys to the added and moved blocks, each run of them sharing the gap between two unchanged blocks
+        sequences: dict[str, str] = {}
+        run: list[str] = []
+        previous: str | None = None
+        for block_id in [*order, None]:
+            if block_id is not None and (block_id in added or block_id in moved):
+                run.append(block_id)
+                continue
+
+            if run:
+                low = None if previous is None else keys[previous]
+                high = None if block_id is None else keys[block_id]
+                sequences.update(zip(run, generate_n_keys_between(low, high, len(run))))
+                run = []
+
+            previous = block_id
+
+        if deleted:
+            await db.execute(
+                "DELETE FROM blocks WHERE page_id = :page_id AND id = ANY(CAST(:ids AS varchar[]));",
+                {"page_id": page_id, "ids": list(deleted)},
+            )
+
+        # The moved blocks may take the keys of each other
+        await db.execute("SET CONSTRAINTS blocks_page_id_sequence_key DEFERRED")
+        if moved:
+            await db.execute(
+                """
+        UPDATE blocks
+            SET sequence = moved.sequence
+        FROM unnest(CAST(:ids AS varchar[]), CAST(:keys AS varchar[])) AS moved(id, sequence)
+        WHERE blocks.page_id = :page_id
+            AND blocks.id = moved.id;""",
+                {"page_id": page_id, "ids": list(moved), "keys": [sequences[block_id] for block_id in moved]},
+            )
+
+        # The patches of the blocks whose whole data is not part of the batch are merged into their stored data
+        patched = {block_id: changes.pop("patches") for block_id, changes in modified.items() if "patches" in changes}
+        if patched:
+            rows = await db.fetch_all(
+                """
+        SELECT id, data FROM blocks
+        WHERE page_id = :page_id
+            AND id = ANY(CAST(:ids AS varchar[]))
+        FOR UPDATE;""",
+                {"page_id": page_id, "ids": list(patched)},
+            )
+            for row in rows:
+                data = orjson.loads(row["data"])
+                modified[row["id"]]["data"] = functools.reduce(merge_patch, patched[row["id"]], data)
+
+        if modified:
+            await db.execute(
+                """
+        UPDATE blocks
+            SET type = COALESCE(modified.type, blocks.type),
+                data = COALESCE(modified.data, blocks.data)
+        FROM unnest(CAST(:ids AS varchar[]), CAST(:types AS varchar[]), CAST(:data AS jsonb[]))
+            AS modified(id, type, data)
+        WHERE blocks.page_id = :page_id
+            AND blocks.id = modified.id;""",
+                {
+                    "page_id": page_id,
+                    "ids": list(modified),
+                    "types": [values.get("type") for values in modified.values()],
+                    "data": [
+                        None if "data" not in values else orjson.dumps(values["data"]).decode()
+                        for values in modified.values()
+                    ],
+                },
+            )
+
+        if added:
+            await db.execute(
+                """
+        INSERT INTO blocks (id, page_id, sequence, type, data)
+        SELECT added.id, :page_id, added.sequence, added.type, added.data
+        FROM unnest(
+            CAST(:ids AS varchar[]), CAST(:keys AS varchar[]), CAST(:types AS varchar[]), CAST(:data AS jsonb[])
+        ) AS added(id, sequence, type, data);""",
+                {
+                    "page_id": page_id,
+                    "ids": list(added),
+                    "keys": [sequences[block_id] for block_id in added],
+                    "types": [values["type"] for values in added.values()],
+                    "data": [orjson.dumps(values["data"]).decode() for values in added.values()],
+                },
+            )
+
+        await db.execute("SET CONSTRAINTS blocks_page_id_sequence_key IMMEDIATE")
+        if added or modified or deleted or moved:
+            await Page.updated(page_id)
+
+        return BatchResult(added=list(added), modified=list(modified), deleted=list(deleted), moved=list(moved))
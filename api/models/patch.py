@@ -0,0 +1,52 @@
+"""
+JSON merge-patches (RFC 7396) of the blocks data.
+
+A patch is an object giving the new values of the changed fields: `null` removes a field, an object is merged into
+the field recursively, any other value replaces it. Only the changed fields are sent, and the database only merges
+them into the stored document instead of receiving a whole new one.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import ARRAY, Text, case, cast, func, literal, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import ColumnElement
+
+__all__ = ["merge_patch", "merge_patch_expression"]
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """Return the target patched, without modifying it."""
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+
+    return result
+
+
+def merge_patch_expression(target: ColumnElement, patch: dict) -> ColumnElement:
+    """Return the SQL expression patching a jsonb value, the same way as `merge_patch`."""
+    target = type_coerce(target, JSONB)
+    # Patching anything else than an object starts from an empty one
+    result = case((func.jsonb_typeof(target) == "object", target), else_=literal({}, JSONB))
+
+    if removed := [key for key, value in patch.items() if value is None]:
+        result = result.op("-", return_type=JSONB)(cast(removed, ARRAY(Text)))
+
+    for key, value in patch.items():
+        if isinstance(value, dict):
+            result = result.op("||", return_type=JSONB)(
+                func.jsonb_build_object(cast(key, Text), merge_patch_expression(target[key], value))
+            )
+
+    if replaced := {key: value for key, value in patch.items() if value is not None and not isinstance(value, dict)}:
+        result = result.op("||", return_type=JSONB)(literal(replaced, JSONB))
+
+    return result
@@ -0,0 +1,83 @@
+"""
+Instrumented connection pool.
+
+Wraps the asyncpg pool of `Database` to bound the time a request waits for a connection and to measure the waits,
+so that the pool of each worker can be sized against the `max_connections` of PostgreSQL.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import time
+from typing import Any
+
+from asyncpg import Connection, Pool
+
+__all__ = ["InstrumentedPool", "PoolTimeout"]
+
+# Upper bounds of the buckets of the acquire-wait histogram, in milliseconds
+WAIT_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolTimeout(Exception):
+    """No connection of the pool got free in time."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"No database connection available after {timeout}s")
+
+
+class InstrumentedPool:
+    """
+    Same as the asyncpg pool it wraps, with a timeout on `acquire` and metrics about the waits.
+    :raises PoolTimeout: from `acquire`, when no connection got free in `timeout` seconds (None waits forever)
+    """
+
+    def __init__(self, pool: Pool, timeout: float | None):
+        self.pool = pool
+        self.timeout = timeout
+        # Tasks waiting for a connection
+        self.waiting = 0
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.waits = [0] * (len(WAIT_BUCKETS) + 1)
+
+    async def acquire(self) -> Connection:
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            connection = await self.pool.acquire(timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeout(self.timeout) from None
+        finally:
+            self.waiting -= 1
+
+        wait = time.monotonic() - start
+        self.acquisitions += 1
+        self.wait_time += wait
+        self.waits[bisect.bisect_left(WAIT_BUCKETS, wait * 1000)] += 1
+        return connection
+
+    def release(self, connection: Connection, *, timeout: float | None = None):
+        return self.pool.release(connection, timeout=timeout)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool, name)
+
+    def stats(self) -> dict[str, Any]:
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            "min_size": self.pool.get_min_size(),
+            "max_size": self.pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self.waiting,
+            "acquisitions": self.acquisitions,
+            "timeouts": self.timeouts,
+            "wait_ms_total": self.wait_time * 1000,
+            # Number of acquisitions per wait, by upper bound in milliseconds
+            "wait_ms": dict(zip([*map(str, WAIT_BUCKETS), "inf"], self.waits)),
+        }
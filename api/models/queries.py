@@ -0,0 +1,96 @@
+"""
+Queries compiled once.
+
+Building a SQLAlchemy statement and compiling it costs more than running the simple queries of the hot paths. A
+`Query` is built once from a statement with named bind parameters, compiled on its first use, and run with the values
+of its parameters. asyncpg prepares the statements and caches them per connection by their SQL text: since the text
+of a `Query` never changes, PostgreSQL parses and plans it once per connection as well.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, NamedTuple
+
+from databases.backends.postgres import PostgresConnection, Record
+from sqlalchemy.sql import ClauseElement
+
+from .base import db, reader
+
+__all__ = ["Query"]
+
+
+class _Compiled(NamedTuple):
+    sql: str
+    # Name, bind processor, default value and whether the value must be given, in the order of the `$n` parameters
+    params: list[tuple[str, Callable[[Any], Any] | None, Any, bool]]
+    result_columns: tuple
+    column_maps: tuple
+
+
+class Query:
+    """
+    A statement compiled once, run with `fetch_one(**values)`, `fetch_all`, `fetch_val` or `execute`.
+    The values are given by the names of the `bindparam` of the statement, the other parameters keep the value they
+    were built with. The records are the same as the ones of `Database`, with the values converted to Python.
+    The statement must have the same SQL text whatever the values: no expanding `IN` parameters.
+    The `read_only` queries run on the replica, see `reader`.
+    """
+
+    def __init__(self, statement: ClauseElement, read_only: bool = False):
+        self.statement = statement
+        self.read_only = read_only
+        self._compiled: _Compiled | None = None
+
+    def compile(self) -> _Compiled:
+        if self._compiled is None:
+            # Same compilation as `PostgresConnection._compile`, done once
+            compiled = self.statement.compile(
+                dialect=db._backend._dialect, compile_kwargs={"render_postcompile": True}
+            )
+            names = sorted(compiled.params)
+            sql = compiled.string % {name: f"${i}" for i, name in enumerate(names, start=1)}
+            processors = compiled._bind_processors
+            params = [
+                (name, processors.get(name), compiled.params[name], compiled.binds[name].required) for name in names
+            ]
+            result_columns = compiled._result_columns
+            self._compiled = _Compiled(
+                sql, params, result_columns, PostgresConnection._create_column_maps(result_columns)
+            )
+
+        return self._compiled
+
+    def _args(self, compiled: _Compiled, values: dict[str, Any]) -> list[Any]:
+        args = []
+        for name, processor, default, required in compiled.params:
+            value = values[name] if required else values.get(name, default)
+            args.append(value if processor is None else processor(value))
+
+        return args
+
+    async def _run(self, method: str, values: dict[str, Any]) -> Any:
+        compiled = self.compile()
+        args = self._args(compiled, values)
+        # The connection of the current task, to run inside its transaction if there is one
+        database = reader() if self.read_only else db
+        async with database.connection() as connection:
+            async with connection._query_lock:
+                return await getattr(connection.raw_connection, method)(compiled.sql, *args)
+
+    def _record(self, row) -> Record:
+        compiled = self._compiled
+        return Record(row, compiled.result_columns, db._backend._dialect, compiled.column_maps)
+
+    async def fetch_one(self, **values: Any) -> Record | None:
+        if (row := await self._run("fetchrow", values)) is not None:
+            return self._record(row)
+
+    async def fetch_all(self, **values: Any) -> list[Record]:
+        return [self._record(row) for row in await self._run("fetch", values)]
+
+    async def fetch_val(self, **values: Any) -> Any:
+        # Through the record, for the values to be converted the same way as `Database.fetch_val`
+        if (row := await self.fetch_one(**values)) is not None:
+            return row[0]
+
+    async def execute(self, **values: Any) -> Any:
+        return await self._run("fetchval", values)
@@ -0,0 +1,193 @@
+"""
+Rank keys ordering the blocks of a page.
+
+A key is a string that can always be generated between two other keys, so inserting or moving a block only writes
+that block. Keys are compared byte per byte (the "C" collation in PostgreSQL), which is also Python's string order.
+
+A key is made of an integer part followed by a fractional part, both written with base 62 digits.
+The first character of the integer part gives its length: "a" to "z" for the positive integers of 1 to 26 digits,
+"Z" to "A" for the negative ones. Appending or prepending blocks only increments or decrements the integer part,
+so keys stay short on pages that grow at their ends.
+The fractional part is only used to insert between two consecutive integers and never ends with a "0".
+
+Adapted from David Greenspan's "Implementing Fractional Indexing".
+"""
+from __future__ import annotations
+
+import string
+
+__all__ = ["DIGITS", "InvalidKey", "generate_key_between", "generate_n_keys_between"]
+
+DIGITS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+INTEGER_ZERO = "a0"
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+
+class InvalidKey(ValueError):
+    """Raise when a rank key is malformed, or when no key can be generated between two keys."""
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    """
+    Return a fractional part between `a` and `b`, `b` being None for the upper bound.
+    `a` may be empty for the lower bound. Neither of them ends with a "0".
+    """
+    if b is not None:
+        # Skip the common prefix, the 0 padding `a` if it is shorter
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    # The first digits are different
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+
+    # The first digits are consecutive
+    if b is not None and len(b) > 1:
+        return b[:1]
+
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+
+    raise InvalidKey(f"Invalid rank key head: {head!r}")
+
+
+def _split(key: str) -> tuple[str, str]:
+    """Validate a key and return its integer and fractional parts."""
+    if not key or key == SMALLEST_INTEGER:
+        raise InvalidKey(f"Invalid rank key: {key!r}")
+
+    n = _integer_length(key[0])
+    integer, fraction = key[:n], key[n:]
+    if len(integer) != n or fraction.endswith(DIGITS[0]) or any(c not in DIGITS for c in key[1:]):
+        raise InvalidKey(f"Invalid rank key: {key!r}")
+
+    return integer, fraction
+
+
+def _increment_integer(integer: str) -> str | None:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+
+        digits[i] = DIGITS[0]
+
+    # Every digit overflowed, the integer gets one digit longer (or shorter if it is negative)
+    if head == "Z":
+        return INTEGER_ZERO
+    if head == "z":
+        return None
+
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> str | None:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+
+        digits[i] = DIGITS[-1]
+
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+
+    return head + "".join(digits)
+
+
+def generate_key_between(a: str | None, b: str | None) -> str:
+    """
+    Return a key sorting strictly between `a` and `b`.
+    None stands for the start of the page as `a`, and for its end as `b`.
+    :raises InvalidKey: one of the keys is malformed, or `a` is not lower than `b`
+    """
+    if a is not None and b is not None and a >= b:
+        raise InvalidKey(f"{a!r} is not lower than {b!r}")
+
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+
+        integer_b, fraction_b = _split(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", fraction_b)
+        if fraction_b:
+            return integer_b
+
+        if (key := _decrement_integer(integer_b)) is None:
+            raise InvalidKey("Cannot generate a key before the smallest one")
+
+        return key
+
+    integer_a, fraction_a = _split(a)
+    if b is None:
+        key = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if key is None else key
+
+    integer_b, fraction_b = _split(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+
+    key = _increment_integer(integer_a)
+    if key is not None and key < b:
+        return key
+
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def generate_n_keys_between(a: str | None, b: str | None, n: int) -> list[str]:
+    """
+    Return `n` sorted keys between `a` and `b`, as short as possible.
+    The keys are spread evenly, leaving room for insertions anywhere between them.
+    """
+    if n <= 0:
+        return []
+    if n == 1:
+        return [generate_key_between(a, b)]
+
+    # Towards an open end, consecutive integers are the shortest keys
+    if b is None:
+        keys = [generate_key_between(a, None)]
+        while len(keys) < n:
+            keys.append(generate_key_between(keys[-1], None))
+        return keys
+
+    if a is None:
+        keys = [generate_key_between(None, b)]
+        while len(keys) < n:
+            keys.append(generate_key_between(None, keys[-1]))
+        return keys[::-1]
+
+    mid = n // 2
+    key = generate_key_between(a, b)
+    return [*generate_n_keys_between(a, key, mid), key, *generate_n_keys_between(key, b, n - mid - 1)]
@@ -3,11 +3,12 @@ from __future__ import annotations
 from typing import Optional, Union
 
 from pydantic import BaseModel, EmailStr, constr
-from sqlalchemy import Column, Integer, String, delete, insert, select, update
+from sqlalchemy import Column, Integer, String, bindparam, delete, insert, select, update
 
 from api import models
 
-from .base import Base, db
+from .base import Base, db, reader
+from .queries import Query
 
 
 class DBUser(Base):
@@ -21,6 +22,15 @@ class DBUser(Base):
     totp_counter = Column(Integer, nullable=True)
 
 
+# The user lookups of the authentication, compiled once. The ones with the credentials stay on the primary, for the
+# TOTP counter not to be read late and a code to be accepted twice
+_public_user = select(DBUser.id, DBUser.email, DBUser.username)
+USER_BY_ID = Query(_public_user.where(DBUser.id == bindparam("id")), read_only=True)
+USER_BY_USERNAME = Query(_public_user.where(DBUser.username == bindparam("username")), read_only=True)
+USERPASS_BY_USERNAME = Query(select(DBUser).where(DBUser.username == bindparam("username")))
+USERPASS_BY_EMAIL = Query(select(DBUser).where(DBUser.email == bindparam("email")))
+
+
 class UserBase(BaseModel):
     email: EmailStr
     username: constr(min_length=3, max_length=20)
@@ -58,21 +68,20 @@ class User(UserBase):
 
     @classmethod
     async def get(cls, username_or_id: Union[int, str]) -> Optional[User]:
-        query = select(DBUser.id, DBUser.email, DBUser.username).select_from(DBUser)
         if isinstance(username_or_id, int):
-            query = query.where(DBUser.id == username_or_id)
+            user = await USER_BY_ID.fetch_one(id=username_or_id)
         elif isinstance(username_or_id, str):
-            query = query.where(DBUser.username == username_or_id)
+            user = await USER_BY_USERNAME.fetch_one(username=username_or_id)
         else:
             raise TypeError(f"must be int or str, not {type(username_or_id)}")
 
-        if user := await db.fetch_one(query):
+        if user:
             return cls(**user)
 
     @classmethod
     async def get_all(cls) -> list[User]:
         """Return a list of all users"""
-        return [cls(**u) for u in await db.fetch_all(select(DBUser))]
+        return [cls(**u) for u in await reader().fetch_all(select(DBUser))]
 
 
 class UserPass(User, UserCreation):
@@ -81,12 +90,12 @@ class UserPass(User, UserCreation):
 
     @classmethod
     async def get(cls, username: str) -> UserPass:
-        if user := await db.fetch_one(select(DBUser).where(DBUser.username == username)):
+        if user := await USERPASS_BY_USERNAME.fetch_one(username=username):
             return UserPass(**user)
 
     @classmethod
     async def from_email(cls, email: str) -> UserPass:
-        if user := await db.fetch_one(select(DBUser).where(DBUser.email == email)):
+        if user := await USERPASS_BY_EMAIL.fetch_one(email=email):
             return UserPass(**user)
 
     async def updateTOTPCounter(self, counter: int | None):
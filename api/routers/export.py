@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from api.models.export import ExportFilters, ExportStats, Format, export
+from api.routers.auth.login import is_connected
+
+__all__ = ["router"]
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    dependencies=[Depends(is_connected)],
+)
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "ndjson.gz": "application/gzip"}
+
+
+@router.get("", response_class=StreamingResponse)
+async def export_pages(
+    format: Format = "ndjson", author: int = None, active: bool = None, since: datetime = None
+) -> StreamingResponse:
+    """
+    Stream all the pages with their ordered blocks: a `{"page": ...}` line followed by a `{"block": ...}` line
+    for each of its blocks. `ndjson.gz` is the same, compressed with gzip.
+    """
+    filters = ExportFilters(author=author, active=active, since=since)
+
+    async def chunks():
+        stats = ExportStats()
+        async for chunk in export(filters, format, stats):
+            yield chunk
+
+        print(f"Exported {stats}")
+
+    return StreamingResponse(
+        chunks(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="notes.{format}"'},
+    )
@@ -5,15 +5,18 @@ from json import JSONDecodeError
 from fastapi import APIRouter, Depends
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
-from api.routers.auth.login import User, is_connected_pass, oauth2_scheme
+from api.models import User
+from api.routers.auth.login import oauth2_scheme
 
-from .client import Client
+from .client import Client, backplane, broadcast
+from .encoding import encodings
 from .export import export_messages
+from .identity import authenticate, forget_user
 from .messages.clientbound.login import Login
 from .messages.serverbound import Handshake
 from .version import GATEWAY_VERSION
 
-__all__ = ["export_messages", "router"]
+__all__ = ["backplane", "broadcast", "export_messages", "forget_user", "router"]
 
 router = APIRouter(
     prefix="/gateway",
@@ -23,8 +26,7 @@ router = APIRouter(
 
 async def is_connected(ws: WebSocket):
     token = await oauth2_scheme(ws)
-    userpass = await is_connected_pass(token)
-    return User(**userpass.dict())
+    return await authenticate(token)
 
 
 @router.websocket("")
@@ -37,10 +39,14 @@ async def websocket_gateway(ws: WebSocket, user: User = Depends(is_connected)):
             handshake = Handshake(**msg["data"])
             supported = handshake.supported()
             client = Client(ws, user, 0, None)
+            client.block_payloads = handshake.payloads
+            client.batch = handshake.batches
+            client.encoding = encodings[handshake.encoding]
+            client.compression = handshake.compressed
 
-            await client.send(Login(success=supported, version=GATEWAY_VERSION, username=user.username))
+            client.send(Login(success=supported, version=GATEWAY_VERSION, username=user.username))
             if supported:
-                async for msg in ws.iter_json():
+                async for msg in client.receive():
                     await client.handle_message(msg)
 
     except JSONDecodeError:
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Callable, Type
+
+import orjson
+from asyncpg.exceptions import InterfaceError, PostgresError
+from databases import Database
+
+from api.models.base import db
+
+from .frame import Frame
+
+__all__ = ["Backplane", "PostgresBackplane", "backplanes"]
+
+Deliver = Callable[[int, Frame, set[int]], None]
+
+
+class Backplane:
+    """
+    Propagate the frames broadcasted in a channel to every gateway worker.
+    This default implementation only delivers them to the current process.
+    """
+
+    def __init__(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, page_id: int, frame: Frame, except_: set[int]):
+        self.deliver(page_id, frame, except_)
+
+
+class PostgresBackplane(Backplane):
+    """
+    Share the frames between workers and hosts using Postgres `LISTEN/NOTIFY`.
+    Frames are delivered locally right away, then notified to the other nodes.
+    """
+
+    CHANNEL = "gateway"
+    # Postgres refuses notifications payloads of 8000 bytes or more
+    MAX_PAYLOAD = 7999
+
+    def __init__(self, deliver: Deliver, database: Database = db):
+        super().__init__(deliver)
+        self.database = database
+        self.node = uuid.uuid4().hex
+        self.listening = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        self.closed.clear()
+        self.task = asyncio.create_task(self._listen())
+        await self.listening.wait()
+
+    async def stop(self):
+        if self.task is not None:
+            self.closed.set()
+            await self.task
+            self.task = None
+
+    async def publish(self, page_id: int, frame: Frame, except_: set[int]):
+        await super().publish(page_id, frame, except_)
+
+        payload = self._payload(page_id, frame)
+        if len(payload) > self.MAX_PAYLOAD:
+            # Without their payloads, the clients will fetch the data by themselves
+            payload = self._payload(page_id, frame.bare)
+            if len(payload) > self.MAX_PAYLOAD:
+                print(f"Frame {frame.id!r} is too large to be sent to the other workers ({len(payload)} bytes)")
+                return
+
+        await self.database.execute(
+            "SELECT pg_notify(:channel, :payload)", {"channel": self.CHANNEL, "payload": payload.decode()}
+        )
+
+    def _payload(self, page_id: int, frame: Frame) -> bytes:
+        return orjson.dumps({"node": self.node, "page": page_id, "id": frame.id, "data": frame.data})
+
+    def _notified(self, connection, pid: int, channel: str, payload: str):
+        msg = orjson.loads(payload)
+        if msg["node"] != self.node:
+            # Client ids are only unique per node, so the exclusions can't be applied here
+            self.deliver(msg["page"], Frame(msg["id"], msg["data"]), set())
+
+    async def _listen(self):
+        retries = 0
+        while not self.closed.is_set():
+            lost = asyncio.Event()
+            try:
+                # Runs in its own task, so this is a dedicated connection taken from the pool
+                async with self.database.connection() as connection:
+                    raw = connection.raw_connection
+                    raw.add_termination_listener(lambda _: lost.set())
+                    await raw.add_listener(self.CHANNEL, self._notified)
+                    self.listening.set()
+                    retries = 0
+
+                    done, pending = await asyncio.wait(
+                        [asyncio.create_task(lost.wait()), asyncio.create_task(self.closed.wait())],
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    for task in pending:
+                        task.cancel()
+
+                    if not lost.is_set():
+                        await raw.remove_listener(self.CHANNEL, self._notified)
+            except (OSError, asyncio.TimeoutError, InterfaceError, PostgresError) as e:
+                print(f"Gateway backplane lost its connection: {e}")
+
+            if not self.closed.is_set():
+                backoff = min(2**retries / 10, 30)
+                print(f"Gateway backplane reconnecting in {backoff}s.")
+                retries += 1
+                await asyncio.sleep(backoff)
+
+
+backplanes: dict[str, Type[Backplane]] = {
+    "local": Backplane,
+    "postgres": PostgresBackplane,
+}
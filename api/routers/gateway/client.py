@@ -2,15 +2,28 @@ from __future__ import annotations
 
 import asyncio
 import random
-from typing import Awaitable, TypedDict
+import sys
+import weakref
+from typing import AsyncIterator, TypedDict
 
+from fastapi import status
 from pydantic import BaseModel
 from starlette.websockets import WebSocket, WebSocketState
 
 from api.models.page import Page
+from api.routers import metrics
 from api.routers.auth.login import User
-from api.routers.utils import tosnake
 
+from .backplane import Backplane, backplanes
+from .constant import (
+    BACKPLANE,
+    CHANNEL_IDLE_TIMEOUT,
+    COALESCE_WINDOW,
+    SEND_FLUSH_TIMEOUT,
+    SEND_QUEUE_SIZE,
+)
+from .encoding import JSON, Encoding
+from .frame import BatchFrame, Frame
 from .messages.clientbound.channel import (
     JoinedChannel,
     LeftChannel,
@@ -19,49 +32,135 @@ from .messages.clientbound.channel import (
 )
 
 channels: dict[int, Channel] = {}
+clients: weakref.WeakSet[Client] = weakref.WeakSet()
 
 
 class Channel:
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, coalesce_window: float = COALESCE_WINDOW):
         self.page = page
         self.clients: dict[int, Client] = {}
+        # Coalescing stage, disabled when the window is 0
+        self.coalesce_window = coalesce_window / 1000
+        self.pending: dict[object, tuple[Frame, set[int]]] = {}  # frames and their recipients
+        self.flush_handle: asyncio.TimerHandle | None = None
+        # Pending eviction of the channel, once its last client left
+        self.evict_handle: asyncio.TimerHandle | None = None
 
     @classmethod
     async def create(cls, client: Client, page_id: int) -> Channel | None:
         channel = channels.get(page_id)
         if channel is None and (page := await Page.get(page_id, client.user)):
-            channels[page_id] = channel = Channel(page)
+            # Another client may have created the channel while the page was fetched
+            channel = channels.setdefault(page_id, Channel(page))
 
         return channel
 
     async def add_client(self, client: Client):
-        # generate new random id that does not exists
-        while (cid := random.randint(0, 1_000_000)) in self.clients:
+        # generate new random id that does not exists.
+        # Ids are only checked on this node, the large range makes collisions with other nodes unlikely.
+        while (cid := random.randint(0, 2**31 - 1)) in self.clients:
             pass
 
+        if self.evict_handle is not None:
+            self.evict_handle.cancel()
+            self.evict_handle = None
+
         self.clients[cid] = client
         client.cid = cid
         client.channel = self
 
         msg = UserJoinedChannel(cid=cid, uid=client.user.id, username=client.user.username)
-        await client.joined_channel(self, cid)
+        client.joined_channel(self, cid)
         await self.broadcast(msg, except_=cid)
 
     async def remove_client(self, client: Client):
         client = self.clients.pop(client.cid)
-        await client.left_channel(self)
+        client.left_channel(self)
+        if not self.clients:
+            self.schedule_eviction()
+
         await self.broadcast(UserLeftChannel(cid=client.cid))
 
-    async def broadcast(self, message: BaseModel, except_: int | set[int] = None):
+    def schedule_eviction(self, timeout: float = CHANNEL_IDLE_TIMEOUT):
+        """Forget the channel once it has been empty for `timeout` seconds, so that quick reconnections reuse it."""
+        if timeout <= 0:
+            return self.evict()
+
+        if self.evict_handle is None:
+            self.evict_handle = asyncio.get_running_loop().call_later(timeout, self.evict)
+
+    def evict(self):
+        self.evict_handle = None
+        if self.clients:
+            return
+
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        self.pending.clear()
+        if channels.get(self.page.id) is self:
+            del channels[self.page.id]
+
+    def size(self) -> int:
+        """Rough memory used by the channel itself, in bytes. The clients are not included."""
+        return sum(map(sys.getsizeof, (self, self.page, self.page.title, self.clients, self.pending)))
+
+    async def broadcast(self, message: BaseModel | Frame, except_: int | set[int] = None):
         """Send a message to all connecetd websocket clients.
-        Will not send the message the client's id specified in `except_`."""
+        Will not send the message the client's id specified in `except_`.
+
+        The message is encoded once and only queued on each client, the actual writes are done by the clients'
+        writer tasks. A slow client will therefore never delay the delivery to the others.
+        The message also goes through the backplane to reach the clients connected to the other workers."""
+
+        if except_ is None:
+            except_ = set()
+        elif not isinstance(except_, set):
+            except_ = {except_}
 
-        ids = set(self.clients.keys())
-        if except_ is not None:
-            ids.difference_update(except_ if isinstance(except_, set) else [except_])
+        await backplane.publish(self.page.id, Frame.from_message(message), except_)
 
-        for cid in ids:
-            await self.clients[cid].send(message)
+    def deliver(self, frame: Frame, except_: set[int]):
+        """Queue a frame on every local client, except the ones in `except_`.
+        When coalescing, the frame is held until the end of the current window."""
+        if frame.id == "page_updated":
+            self.page = Page(**frame.data["page"])
+
+        if not self.coalesce_window:
+            for cid, client in self.clients.items():
+                if cid not in except_:
+                    client.send(frame)
+            return
+
+        # Keep the frames ordered: a superseded frame is removed, the latest one goes at the end.
+        # The recipients are the clients present now, not the ones that will have joined at the end of the window.
+        key = frame.coalesce_key or object()
+        self.pending.pop(key, None)
+        self.pending[key] = frame, self.clients.keys() - except_
+
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.coalesce_window, self.flush)
+
+    def flush(self):
+        """Send the frames held by the coalescing stage, as a single batch to the clients supporting it."""
+        pending, self.pending = list(self.pending.values()), {}
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        # Clients receiving the same frames share the same batch, so that it is only encoded once
+        batches: dict[tuple[int, ...], BatchFrame] = {}
+        for cid, client in self.clients.items():
+            indexes = tuple(i for i, (_, recipients) in enumerate(pending) if cid in recipients)
+            if len(indexes) > 1 and client.batch:
+                if (batch := batches.get(indexes)) is None:
+                    batches[indexes] = batch = BatchFrame([pending[i][0] for i in indexes])
+
+                client.send(batch)
+            else:
+                for i in indexes:
+                    client.send(pending[i][0])
 
     async def close(self):
         for client in self.clients.values():
@@ -78,6 +177,30 @@ class MessageModel(BaseModel):
     data: dict
 
 
+class Bandwidth(BaseModel):
+    """Traffic of gateway connections. Outgoing bytes are counted before (`bytes_out`) and after compression."""
+
+    messages_in: int = 0
+    bytes_in: int = 0
+    messages_out: int = 0
+    bytes_out: int = 0
+    compressed_out: int = 0
+    wire_bytes_out: int = 0
+
+    def received(self, size: int):
+        self.messages_in += 1
+        self.bytes_in += size
+
+    def sent(self, size: int, wire_size: int, compressed: bool):
+        self.messages_out += 1
+        self.bytes_out += size
+        self.wire_bytes_out += wire_size
+        self.compressed_out += compressed
+
+
+# Traffic of all the connections since the worker started
+bandwidth = Bandwidth()
+
 
 class Client:
     def __init__(self, ws: WebSocket, user: User, cid: int = 0, channel: Channel | None = None):
@@ -85,39 +208,143 @@ class Client:
         self.cid = cid
         self.user = user
         self.channel = channel
+        self.block_payloads = False
+        self.batch = False
+        self.encoding: Encoding = JSON
+        self.compression = False
+        self.queue: asyncio.Queue[BaseModel | Frame | None] = asyncio.Queue(SEND_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self._write())
+        # Set once the client is being disconnected, the writer is only cancelled at its next await
+        self.closing = False
+        # Closing of a client that couldn't keep up, referenced until done for the loop to not collect it
+        self.closer: asyncio.Task | None = None
+        clients.add(self)
+
+    def send(self, msg: BaseModel | Frame):
+        """Queue a message to be sent to the client. Never blocks.
+        If the client can't keep up and its queue is full, it gets disconnected."""
+        if self.closing or self.writer.done():
+            return
+
+        try:
+            self.queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.closing = True
+            print(f"Disconnect client {self.user.username} due to a full send queue")
+            self.writer.cancel()
+            self.closer = asyncio.create_task(self.close(status.WS_1008_POLICY_VIOLATION))
+
+    async def _write(self):
+        while (msg := await self.queue.get()) is not None:
+            if self.ws.client_state != WebSocketState.CONNECTED:
+                return
+
+            frame = Frame.from_message(msg)
+            if not self.block_payloads:
+                frame = frame.bare
+
+            payload = frame.encode(self.encoding)
+            size = len(payload) if self.encoding.binary else len(payload.encode())
+            compressed = frame.compress(self.encoding) if self.compression else None
+            try:
+                if compressed is not None:
+                    await self.ws.send_bytes(compressed)
+                elif self.encoding.binary:
+                    await self.ws.send_bytes(payload)
+                else:
+                    await self.ws.send_text(payload)
+            except (OSError, RuntimeError):
+                # The socket has been closed while we were writing to it
+                return
+
+            wire_size = size if compressed is None else len(compressed)
+            bandwidth.sent(size, wire_size, compressed is not None)
+
+    async def flush(self):
+        """Stop the writer once all the queued messages have been sent."""
+        if self.writer.done():
+            return
+
+        try:
+            self.queue.put_nowait(None)
+            await asyncio.wait_for(self.writer, SEND_FLUSH_TIMEOUT)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.writer.cancel()
+
+    async def receive(self) -> AsyncIterator[Message]:
+        """Iterate over the messages sent by the client, decoded with the negotiated encoding."""
+        if not self.encoding.binary:
+            messages = self.ws.iter_text()
+        else:
+            messages = self.ws.iter_bytes()
+
+        async for data in messages:
+            size = len(data) if isinstance(data, bytes) else len(data.encode())
+            bandwidth.received(size)
 
-    def send(self, msg: BaseModel) -> Awaitable[None]:
-        if self.ws.client_state != WebSocketState.CONNECTED:
-            return asyncio.sleep(0)
+            yield self.encoding.loads(data)
 
-        name = tosnake(msg.__class__.__name__)
-        return self.ws.send_text(MessageModel(id=name, data=msg.dict()).json())
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        if self.ws.client_state == WebSocketState.CONNECTED:
+            await self.ws.close(code)
 
     async def disconnected(self):
         if self.channel is not None:
             await self.channel.remove_client(self)
 
-    async def joined_channel(self, channel: Channel, cid: int):
-        await self.send(JoinedChannel(cid=cid, page=channel.page))
+        await self.flush()
 
-    async def left_channel(self, channel: Channel):
+    def joined_channel(self, channel: Channel, cid: int):
+        self.send(JoinedChannel(cid=cid, page=channel.page))
+
+    def left_channel(self, channel: Channel):
         if self.channel is not None and self.channel != channel:
             return
 
         self.channel = None
-        await self.send(LeftChannel())
+        self.send(LeftChannel())
 
     async def handle_message(self, msg: Message):
-        if "id" not in msg or "data" not in msg:
+        if not isinstance(msg, dict) or "id" not in msg or "data" not in msg:
             raise ValueError("Message is missing id or data")
 
         msgid = msg["id"]
-        cls = serverbound_messages.get(msgid)
-        if cls is None:
+        parse = serverbound_parsers.get(msgid)
+        if parse is None:
             raise ValueError(f"Invalid serverbound message: {msgid}")
 
-        msg = cls(**msg["data"])
-        await msg.handle(self)
+        await parse(msg["data"]).handle(self)
+
+
+@metrics.register("gateway")
+def gateway_metrics() -> dict:
+    return {
+        "bandwidth": bandwidth,
+        "channels": {
+            "count": len(channels),
+            "idle": sum(channel.evict_handle is not None for channel in channels.values()),
+            "clients": sum(len(channel.clients) for channel in channels.values()),
+            "bytes": sum(channel.size() for channel in channels.values()),
+        },
+        # Aggregated, any connected user can read the metrics
+        "connections": {
+            "count": len(clients),
+            "queued": sum(client.queue.qsize() for client in clients),
+            "closing": sum(client.closing for client in clients),
+        },
+    }
+
+
+async def broadcast(page_id: int, message: BaseModel | Frame):
+    """Send a message to all the clients connected to a page, from outside the gateway."""
+    await backplane.publish(page_id, Frame.from_message(message), set())
+
+
+def deliver(page_id: int, frame: Frame, except_: set[int]):
+    if (channel := channels.get(page_id)) is not None:
+        channel.deliver(frame, except_)
+
 
+backplane: Backplane = backplanes[BACKPLANE](deliver)
 
-from .messages.serverbound.register import serverbound_messages
+from .messages.serverbound.register import serverbound_parsers
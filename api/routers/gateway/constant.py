@@ -0,0 +1,36 @@
+import os
+
+__all__ = [
+    "BACKPLANE",
+    "CHANNEL_IDLE_TIMEOUT",
+    "COALESCE_WINDOW",
+    "COMPRESSION_LEVEL",
+    "COMPRESSION_THRESHOLD",
+    "IDENTITY_CACHE_SIZE",
+    "IDENTITY_CACHE_TTL",
+    "SEND_QUEUE_SIZE",
+    "SEND_FLUSH_TIMEOUT",
+]
+
+# Maximum number of messages waiting to be written to a single websocket.
+# A client that falls this far behind is disconnected instead of slowing down the others.
+SEND_QUEUE_SIZE = int(os.getenv("GATEWAY_SEND_QUEUE_SIZE", 256))
+# Time given to a client to flush its pending messages when the connection is closing, in seconds.
+SEND_FLUSH_TIMEOUT = float(os.getenv("GATEWAY_SEND_FLUSH_TIMEOUT", 5))
+# How broadcasts reach the other workers: "local" (single process) or "postgres" (LISTEN/NOTIFY).
+BACKPLANE = os.getenv("GATEWAY_BACKPLANE", "local")
+# Time during which the events of a channel are held to merge the redundant ones and send them as a single batch,
+# in milliseconds. 0 disables the coalescing, 16 to 50 is a good range for busy pages.
+COALESCE_WINDOW = float(os.getenv("GATEWAY_COALESCE_WINDOW", 0))
+# zlib level used for the clients that negotiated the compression, from 1 (fastest) to 9 (smallest)
+COMPRESSION_LEVEL = int(os.getenv("GATEWAY_COMPRESSION_LEVEL", 6))
+# Encoded frames smaller than this number of bytes are never compressed
+COMPRESSION_THRESHOLD = int(os.getenv("GATEWAY_COMPRESSION_THRESHOLD", 1024))
+# Maximum number of tokens whose user is kept in memory, to authenticate reconnecting clients without the database
+IDENTITY_CACHE_SIZE = int(os.getenv("GATEWAY_IDENTITY_CACHE_SIZE", 10000))
+# Time during which a verified token is trusted without looking up its user again, in seconds.
+# A deleted account on another worker can still connect for this long. 0 disables the cache.
+IDENTITY_CACHE_TTL = float(os.getenv("GATEWAY_IDENTITY_CACHE_TTL", 60))
+# Time during which an empty channel is kept, so that reloading a page does not fetch it again, in seconds.
+# 0 forgets the channels as soon as their last client leaves.
+CHANNEL_IDLE_TIMEOUT = float(os.getenv("GATEWAY_CHANNEL_IDLE_TIMEOUT", 30))
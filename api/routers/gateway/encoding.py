@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+import msgpack
+import orjson
+
+__all__ = ["Encoding", "JsonEncoding", "MsgpackEncoding", "encodings"]
+
+
+class Encoding:
+    """Wire format of the gateway messages, negotiated during the handshake."""
+
+    name: str
+    # Binary encodings are sent in binary websocket frames, the others in text frames
+    binary: bool
+
+    def dumps(self, message: dict) -> str | bytes:
+        raise NotImplementedError()
+
+    def loads(self, data: str | bytes) -> Any:
+        raise NotImplementedError()
+
+
+class JsonEncoding(Encoding):
+    name = "json"
+    binary = False
+
+    def dumps(self, message: dict) -> str:
+        return orjson.dumps(message).decode()
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+def _msgpack_default(obj: Any) -> Any:
+    # Same representation as in JSON
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+class MsgpackEncoding(Encoding):
+    name = "msgpack"
+    binary = True
+
+    def dumps(self, message: dict) -> bytes:
+        return msgpack.packb(message, default=_msgpack_default)
+
+    def loads(self, data: str | bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+JSON = JsonEncoding()
+
+encodings: dict[str, Encoding] = {encoding.name: encoding for encoding in (JSON, MsgpackEncoding())}
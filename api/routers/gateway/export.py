@@ -2,10 +2,10 @@ from .messages.clientbound.register import clientbound_messages
 from .messages.serverbound.register import serverbound_messages
 
 TYPES = {"integer": "number"}
-IMPORTS = {"Page": "@/stores/page"}
+IMPORTS = {"Block": "@/stores/block", "Page": "@/stores/page"}
 
 
-def totype(name: str, prop: dict[str, str], required: set[str], imports: dict[str, set[str]]) -> str:
+def totypename(prop: dict, imports: dict[str, set[str]]) -> str:
     if "$ref" in prop:
         typename = prop["$ref"].split("/")[-1]
 
@@ -15,11 +15,21 @@ def totype(name: str, prop: dict[str, str], required: set[str], imports: dict[st
                 imports[source] = set()
 
             imports[source].add(typename)
-    else:
-        typename = TYPES.get(prop["type"], prop["type"])
 
+        return typename
+
+    if "enum" in prop:
+        return " | ".join(repr(value) for value in prop["enum"])
+
+    if prop["type"] == "array":
+        return totypename(prop["items"], imports) + "[]"
+
+    return TYPES.get(prop["type"], prop["type"])
+
+
+def totype(name: str, prop: dict, required: set[str], imports: dict[str, set[str]]) -> str:
     req = "" if name in required else "?"
-    return f"{name}{req}: {typename}"
+    return f"{name}{req}: {totypename(prop, imports)}"
 
 
 def tointerface(schema: dict, sep: str = ", ", imports: dict[str, set[str]] = {}) -> str:
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import functools
+import zlib
+from typing import Type
+
+from pydantic import BaseModel
+
+from api.routers.utils import tosnake
+
+from .constant import COMPRESSION_LEVEL, COMPRESSION_THRESHOLD
+from .encoding import JSON, Encoding
+
+__all__ = ["BatchFrame", "Frame", "message_id"]
+
+# Fields only sent to the clients that negotiated them during the handshake
+PAYLOAD_FIELDS = frozenset({"block"})
+# Messages that supersede the previous ones for the same block when they are coalesced
+COALESCED_MESSAGES = frozenset({"block_modified"})
+
+
+@functools.cache
+def message_id(cls: Type[BaseModel]) -> str:
+    """Return the id of a message class, as sent on the wire."""
+    return tosnake(cls.__name__)
+
+
+class Frame:
+    """A clientbound message that is encoded only once, whatever the number of clients it is sent to."""
+
+    __slots__ = ("id", "data", "_encoded", "_compressed", "_bare")
+
+    def __init__(self, id: str, data: dict):
+        self.id = id
+        self.data = data
+        self._encoded: dict[str, str | bytes] = {}
+        self._compressed: dict[str, bytes | None] = {}
+        self._bare: Frame | None = None
+
+    @classmethod
+    def from_message(cls, msg: BaseModel | Frame) -> Frame:
+        if isinstance(msg, Frame):
+            return msg
+
+        return cls(message_id(type(msg)), msg.dict())
+
+    def encode(self, encoding: Encoding) -> str | bytes:
+        """Encode the frame, at most once per encoding."""
+        if (encoded := self._encoded.get(encoding.name)) is None:
+            self._encoded[encoding.name] = encoded = encoding.dumps({"id": self.id, "data": self.data})
+
+        return encoded
+
+    def compress(self, encoding: Encoding) -> bytes | None:
+        """Compress the encoded frame, at most once per encoding. None if the frame is below the threshold."""
+        if encoding.name not in self._compressed:
+            encoded = self.encode(encoding)
+            if isinstance(encoded, str):
+                encoded = encoded.encode()
+
+            compressed = None
+            if len(encoded) >= COMPRESSION_THRESHOLD:
+                compressed = zlib.compress(encoded, COMPRESSION_LEVEL)
+
+            self._compressed[encoding.name] = compressed
+
+        return self._compressed[encoding.name]
+
+    @property
+    def text(self) -> str:
+        return self.encode(JSON)
+
+    @property
+    def coalesce_key(self) -> tuple[str, str] | None:
+        """Frames with the same key can be merged into the latest one. None if this frame can't be merged."""
+        # A patch only applies on top of the previous ones, they are all kept
+        if self.id in COALESCED_MESSAGES and self.data.get("patch") is None:
+            return self.id, self.data["block_id"]
+
+    @property
+    def bare(self) -> Frame:
+        """The same frame without its payloads, for the clients that did not negotiate them."""
+        if self._bare is None:
+            if PAYLOAD_FIELDS.isdisjoint(self.data):
+                self._bare = self
+            else:
+                self._bare = Frame(self.id, {k: v for k, v in self.data.items() if k not in PAYLOAD_FIELDS})
+
+        return self._bare
+
+
+class BatchFrame(Frame):
+    """Several frames sent as a single `batch` message."""
+
+    __slots__ = ("frames",)
+
+    def __init__(self, frames: list[Frame]):
+        super().__init__("batch", {"messages": [{"id": frame.id, "data": frame.data} for frame in frames]})
+        self.frames = frames
+
+    @property
+    def bare(self) -> Frame:
+        if self._bare is None:
+            frames = [frame.bare for frame in self.frames]
+            self._bare = self if all(a is b for a, b in zip(frames, self.frames)) else BatchFrame(frames)
+
+        return self._bare
@@ -0,0 +1,52 @@
+from fastapi import HTTPException, status
+
+from api.cache import LRUCache
+from api.models import User
+from api.routers.auth import jwt
+from api.routers.auth.login import is_connected_pass
+from api.routers.metrics import register
+
+from .constant import IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL
+
+__all__ = ["authenticate", "forget_user"]
+
+# Users already verified for a token, so that a reconnecting client does not hit the database again
+identities: LRUCache[str, User] = LRUCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+
+
+async def authenticate(token: str) -> User:
+    """
+    Return the user connected with this token.
+    The signature and the expiration of the token are always checked,
+    only the user lookup is skipped when the token was verified recently.
+    """
+    if (user := identities.get(token)) is not None:
+        try:
+            req_2fa, _ = jwt.decode(token)
+            if not req_2fa:
+                return user
+        except jwt.TokenError:
+            pass
+
+        identities.pop(token)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Impossible de vérifier le token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    userpass = await is_connected_pass(token)
+    user = User(**userpass.dict())
+    if IDENTITY_CACHE_TTL > 0:
+        identities.set(token, user)
+    return user
+
+
+def forget_user(user_id: int):
+    """Drop the cached identities of a user, e.g. when the account is deleted."""
+    identities.evict(lambda user: user.id == user_id)
+
+
+@register("gateway_identities")
+def identity_metrics() -> dict[str, float]:
+    return identities.stats()
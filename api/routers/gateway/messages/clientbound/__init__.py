@@ -1,3 +1,4 @@
+from .batch import *
 from .channel import *
 from .login import *
 from .page import *
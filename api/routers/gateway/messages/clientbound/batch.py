@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+from .register import register
+
+__all__ = ["Batch"]
+
+
+@register
+class Batch(BaseModel):
+    """Several messages sent at once by the coalescing stage, to the clients that negotiated it."""
+
+    messages: list[dict]
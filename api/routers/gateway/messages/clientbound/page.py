@@ -1,15 +1,22 @@
 from pydantic import BaseModel
 
-from api.models.page import BlockId
+from api.models.page import Block, BlockId, Page
 
 from .register import register
 
-__all__ = ["BlockModified", "BlockDeleted", "BlockAdded"]
+__all__ = ["BlockModified", "BlockDeleted", "BlockAdded", "BlockMoved", "BlocksChanged", "PageUpdated"]
+
+
+# The `block` payloads are only sent to the clients that asked for them in their handshake.
+# The others have to fetch the block themselves.
 
 
 @register
 class BlockModified(BaseModel):
     block_id: BlockId
+    block: Block | None = None
+    # Merge-patch of the block data, to apply on top of the previous version
+    patch: dict | None = None
 
 
 @register
@@ -20,9 +27,28 @@ class BlockDeleted(BaseModel):
 @register
 class BlockAdded(BaseModel):
     block_id: BlockId
+    block: Block | None = None
 
 
 @register
 class BlockMoved(BaseModel):
     block_id: BlockId
     dest: int
+    block: Block | None = None
+
+
+@register
+class BlocksChanged(BaseModel):
+    """Several blocks were changed at once by a batch, the clients reload the ones they need."""
+
+    added: list[BlockId]
+    modified: list[BlockId]
+    deleted: list[BlockId]
+    moved: list[BlockId]
+
+
+@register
+class PageUpdated(BaseModel):
+    """The title or the state of the page changed."""
+
+    page: Page
@@ -12,7 +12,7 @@ class RequestJoinChannel(ServerBoundMessage):
         if client.channel is not None:
             # check if this is already the right channel
             if client.channel.page.id == self.page_id:
-                return await client.joined_channel(client.channel, client.cid)
+                return client.joined_channel(client.channel, client.cid)
 
             # otherwise remove the client from the channel
             await client.channel.remove_client(client)
@@ -20,7 +20,7 @@ class RequestJoinChannel(ServerBoundMessage):
         if channel := await Channel.create(client, self.page_id):
             await channel.add_client(client)
         else:
-            await client.send(ChannelNotFound(page_id=self.page_id))
+            client.send(ChannelNotFound(page_id=self.page_id))
 
 
 @register
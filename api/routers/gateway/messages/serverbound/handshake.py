@@ -1,12 +1,36 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
-from ...version import GATEWAY_VERSION
+from ...version import GATEWAY_VERSION, MIN_GATEWAY_VERSION
 from .register import register
 
 
 @register
 class Handshake(BaseModel):
     version: int
+    # Since version 1: receive the blocks with their events instead of fetching them
+    block_payloads: bool = False
+    # Since version 1: accept several messages grouped in a `batch` message
+    batch: bool = False
+    # Encoding of all the following messages, starting with the login reply.
+    # Binary encodings are exchanged in binary websocket frames.
+    encoding: Literal["json", "msgpack"] = "json"
+    # Since version 1: large clientbound messages are sent zlib-compressed, in binary frames.
+    # They start with a zlib header byte (0x78), which is neither valid JSON nor a MessagePack message.
+    compression: bool = False
 
     def supported(self) -> bool:
-        return self.version == GATEWAY_VERSION
+        return MIN_GATEWAY_VERSION <= self.version <= GATEWAY_VERSION
+
+    @property
+    def payloads(self) -> bool:
+        return self.version >= 1 and self.block_payloads
+
+    @property
+    def batches(self) -> bool:
+        return self.version >= 1 and self.batch
+
+    @property
+    def compressed(self) -> bool:
+        return self.version >= 1 and self.compression
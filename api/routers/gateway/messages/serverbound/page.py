@@ -1,4 +1,8 @@
-from api.models.page import BlockId
+from typing import Type
+
+from pydantic import BaseModel
+
+from api.models.page import Block, BlockId
 
 from ...client import Client
 from ..clientbound import page as cmsg
@@ -8,13 +12,26 @@ from .register import register
 __all__ = ["BlockModified"]
 
 
+async def broadcast_block(client: Client, message: Type[BaseModel], block_id: BlockId, **kwargs):
+    """Broadcast a block event along with the block, so that the other clients don't have to fetch it."""
+    block = await Block.get(client.channel.page.id, block_id)
+    await client.channel.broadcast(message(block_id=block_id, block=block, **kwargs), client.cid)
+
+
 @register
 class BlockModified(ServerBoundMessage):
     block_id: BlockId
+    # The merge-patch sent to update the block, the other clients apply it as well instead of fetching the block
+    patch: dict | None = None
 
     async def handle(self, client: Client):
-        if client.channel is not None:
-            await client.channel.broadcast(cmsg.BlockModified(block_id=self.block_id), client.cid)
+        if client.channel is None:
+            return
+
+        if self.patch is not None:
+            await client.channel.broadcast(cmsg.BlockModified(block_id=self.block_id, patch=self.patch), client.cid)
+        else:
+            await broadcast_block(client, cmsg.BlockModified, self.block_id)
 
 
 @register
@@ -32,7 +49,7 @@ class BlockAdded(ServerBoundMessage):
 
     async def handle(self, client: Client):
         if client.channel is not None:
-            await client.channel.broadcast(cmsg.BlockAdded(block_id=self.block_id), client.cid)
+            await broadcast_block(client, cmsg.BlockAdded, self.block_id)
 
 
 @register
@@ -42,4 +59,4 @@ class BlockMoved(ServerBoundMessage):
 
     async def handle(self, client: Client):
         if client.channel is not None:
-            await client.channel.broadcast(cmsg.BlockMoved(block_id=self.block_id, dest=self.dest), client.cid)
+            await broadcast_block(client, cmsg.BlockMoved, self.block_id, dest=self.dest)
@@ -1,11 +1,15 @@
 import warnings
-from typing import Type
+from typing import Any, Callable, Literal, Type, get_args, get_origin
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConstrainedStr, Extra
+from pydantic.fields import SHAPE_SINGLETON, ModelField
 
 from api.routers.utils import tosnake
 
 serverbound_messages: dict[str, BaseModel] = {}
+serverbound_parsers: dict[str, Callable[[Any], BaseModel]] = {}
+
+Check = Callable[[Any], bool]
 
 
 def register(cls: Type[BaseModel]):
@@ -14,5 +18,74 @@ def register(cls: Type[BaseModel]):
         warnings.warn(f"Message already registered: {msgid}.")
     else:
         serverbound_messages[msgid] = cls
+        serverbound_parsers[msgid] = compile_parser(cls)
 
     return cls
+
+
+def compile_check(field: ModelField) -> Check | None:
+    """
+    Return a function telling if a value is already valid for the field, as is.
+    None if the field is too complex to be checked without pydantic.
+    """
+    tp = field.type_
+    if field.shape != SHAPE_SINGLETON or field.sub_fields or field.class_validators:
+        return None
+
+    if tp is bool or tp is int or tp is str:
+        check = lambda v: type(v) is tp  # noqa: E731
+    elif tp is dict:
+        # Kept as is by pydantic, whatever its content
+        check = lambda v: isinstance(v, dict)  # noqa: E731
+    elif get_origin(tp) is Literal:
+        allowed = frozenset(get_args(tp))
+        check = lambda v: type(v) is str and v in allowed  # noqa: E731
+    elif isinstance(tp, type) and issubclass(tp, ConstrainedStr):
+        if tp.strip_whitespace or getattr(tp, "to_upper", False) or tp.to_lower or tp.regex or tp.curtail_length:
+            return None
+
+        min_length, max_length = tp.min_length or 0, tp.max_length or float("inf")
+        check = lambda v: type(v) is str and min_length <= len(v) <= max_length  # noqa: E731
+    else:
+        return None
+
+    if field.allow_none:
+        return lambda v: v is None or check(v)
+
+    return check
+
+
+def compile_parser(cls: Type[BaseModel]) -> Callable[[Any], BaseModel]:
+    """
+    Build a function creating a message from its data.
+    Well-formed data made of simple types are trusted once checked, skipping pydantic's validation.
+    Anything else goes through the full validation, which converts the values or rejects the message.
+    """
+    config = cls.__config__
+    if config.extra != Extra.ignore or config.anystr_strip_whitespace or config.anystr_lower:
+        return cls.parse_obj
+
+    fields: list[tuple[str, str, bool, Check]] = []
+    for name, field in cls.__fields__.items():
+        if (check := compile_check(field)) is None:
+            return cls.parse_obj
+
+        fields.append((name, field.alias, field.required, check))
+
+    def parse(data: Any) -> BaseModel:
+        if type(data) is not dict:
+            return cls.parse_obj(data)
+
+        values = {}
+        for name, alias, required, check in fields:
+            if alias in data:
+                if not check(value := data[alias]):
+                    return cls.parse_obj(data)
+
+                values[name] = value
+            elif required:
+                return cls.parse_obj(data)
+
+        return cls.construct(set(values), **values)
+
+    return parse
@@ -1 +1,3 @@
-GATEWAY_VERSION = 0
+GATEWAY_VERSION = 1
+# Oldest version still accepted during the handshake
+MIN_GATEWAY_VERSION = 0
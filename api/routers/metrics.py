@@ -0,0 +1,43 @@
+from typing import Any, Callable
+
+from fastapi import APIRouter, Depends
+
+from api.models.base import db, read_db
+from api.routers.auth.login import is_connected
+
+__all__ = ["register", "router"]
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(is_connected)],
+)
+
+collectors: dict[str, Callable[[], Any]] = {}
+
+
+def register(name: str):
+    """Register a function returning the current metrics of a component."""
+
+    def deco(collector: Callable[[], Any]):
+        collectors[name] = collector
+        return collector
+
+    return deco
+
+
+@router.get("")
+async def get_metrics() -> dict[str, Any]:
+    """Return the metrics of every component of this worker."""
+    return {name: collector() for name, collector in collectors.items()}
+
+
+@register("database_pool")
+def pool_metrics() -> dict[str, Any]:
+    return {} if db.pool is None else db.pool.stats()
+
+
+@register("database_read_pool")
+def read_pool_metrics() -> dict[str, Any]:
+    # The same pool as `database_pool` without a replica
+    return {} if read_db.pool is None else read_db.pool.stats()
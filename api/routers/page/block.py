@@ -1,16 +1,31 @@
+import functools
+from typing import Any, AsyncIterator, Awaitable, Callable
+
 from asyncpg.exceptions import ForeignKeyViolationError
-from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, conlist
 
 from api.models.page import (
+    BatchResult,
     Block,
     BlockCreation,
+    BlockExists,
     BlockId,
+    BlockNotFound,
+    BlockOperation,
     BlockUpdate,
-    Page,
+    PageArchived,
     PageNotFound,
+    block_json,
+    contents,
+    edits,
 )
-from api.routers import utils
+from api.routers import gateway, metrics, utils
+from api.routers.gateway.messages.clientbound import BlocksChanged
+
+# Maximum number of operations in a single batch
+MAX_BATCH_SIZE = 1000
 
 router = APIRouter(
     prefix="/{page_id}",
@@ -18,9 +33,100 @@ router = APIRouter(
 )
 
 
+@metrics.register("page_cache")
+def page_cache_metrics() -> dict[str, float]:
+    return contents.stats()
+
+
+@metrics.register("page_edits")
+def page_edits_metrics() -> dict[str, float]:
+    return edits.stats()
+
+
+async def start_sequence(page_id: int, cursor: str | None, start: BlockId | None) -> str | None:
+    """Sequence after which a listing starts, from its cursor or from the id of the block before (`start`)."""
+    if cursor is not None:
+        (sequence,) = utils.decode_cursor(cursor, str)
+        return sequence
+
+    if start is not None:
+        if (sequence := await Block.sequence_of(page_id, start)) is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, "This block does not exists")
+
+        return sequence
+
+
 @router.get("/blocks", response_model=list[Block])
-async def get_page_content(page_id: int, start: BlockId = None):
-    return await Block.get_slice(page_id, start, size=-1)
+async def get_page_content(
+    page_id: int,
+    response: Response,
+    cursor: str = None,
+    size: int = 0,
+    start: BlockId = None,
+    payloads: bool = False,
+) -> list[Block]:
+    """
+    Return the blocks of a page, in order. All of them unless a `size` is given.
+    When there are more blocks, the `X-Next-Cursor` header holds the `cursor` to pass to get the next ones.
+    `start`, the id of the block to start after, is kept for the older clients.
+    The blocks with a large data are stubs, with a null `data`, unless the `payloads` are asked for.
+    """
+    after = await start_sequence(page_id, cursor, start)
+    blocks = await Block.get_slice(page_id, after, size, payloads)
+    if 0 < size == len(blocks):
+        response.headers[utils.NEXT_CURSOR_HEADER] = utils.encode_cursor(blocks[-1].sequence)
+
+    return blocks
+
+
+@router.get("/blocks/stream", response_class=StreamingResponse)
+async def stream_page_content(page_id: int, cursor: str = None, payloads: bool = False) -> StreamingResponse:
+    """
+    Stream the blocks of a page as newline-delimited JSON, while they are read from the database.
+    The memory used does not depend on the size of the page. The large blocks are stubs, as in the listing.
+    """
+    after = await start_sequence(page_id, cursor, None)
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for row in Block.iterate_slice(page_id, after, payloads=payloads):
+            row = row._mapping
+            fields = {key: row[key] for key in ("id", "page_id", "sequence", "type", "size", "hash")}
+            yield block_json(fields, row["data"]) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def writable(coro: Callable[..., Awaitable[Any]]):
+    """Answer 404 if the page does not exists, and 304 if it is archived, as checked by the write itself."""
+
+    @functools.wraps(coro)
+    async def wrapper(*a, **kw):
+        try:
+            return await coro(*a, **kw)
+        except PageNotFound as e:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, str(e))
+        except PageArchived:
+            raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
+
+    return wrapper
+
+
+@router.post("/blocks/batch", response_model=BatchResult)
+@writable
+async def batch_blocks(page_id: int, operations: conlist(BlockOperation, max_items=MAX_BATCH_SIZE)) -> BatchResult:
+    """
+    Apply a list of add, update, delete and move operations in order, in a single transaction.
+    Either all of them are applied or none is. The clients connected to the page are notified once.
+    """
+    try:
+        result = await Block.batch(page_id, operations)
+    except BlockNotFound as e:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, str(e))
+    except BlockExists as e:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(e))
+
+    await gateway.broadcast(page_id, BlocksChanged(**result.dict()))
+    return result
 
 
 @router.get("/block/{block_id}", response_model=Block)
@@ -30,33 +136,25 @@ async def get_block(page_id: int, block_id: BlockId) -> Block:
 
 
 @router.post("/block/{block_id}", response_model=Block)
+@writable
 async def add_block(page_id: int, block_id: BlockId, block: BlockCreation) -> Block:
-    if await Page.is_archived(page_id):
-        raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
-
     try:
         return await Block.add(page_id, block_id, block)
-    except PageNotFound as e:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, str(e))
     except ForeignKeyViolationError:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Cette page n'existe pas")
 
 
 @router.put("/block/{block_id}", response_model=Block)
 @utils.exists("This block does not exists")
+@writable
 async def update_block(page_id: int, block_id: BlockId, block: BlockUpdate) -> Block:
-    if await Page.is_archived(page_id):
-        raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
-
     return await Block.update(page_id, block_id, block)
 
 
 @router.delete("/block/{block_id}", response_model=Block)
 @utils.exists("This block does not exists")
+@writable
 async def remove_block(page_id: int, block_id: BlockId) -> Block:
-    if await Page.is_archived(page_id):
-        raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
-
     return await Block.delete(page_id, block_id)
 
 
@@ -65,18 +163,14 @@ class BlockMove(BaseModel):
 
 
 @router.put("/block/{block_id}/move")
+@writable
 async def move_block(page_id: int, block_id: BlockId, move: BlockMove) -> Block:
-    if await Page.is_archived(page_id):
-        raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
-
     await Block.move(page_id, block_id, move.dest)
 
 
 @router.put("/blocks/swap")
+@writable
 async def swap_blocks(page_id: int, blocks: tuple[BlockId, BlockId]):
-    if await Page.is_archived(page_id):
-        raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
-
     try:
         await Block.swap(page_id, blocks[0], blocks[1])
     except ValueError as e:
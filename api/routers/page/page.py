@@ -1,19 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Any
 
-from api.models.page import Page, PageCreation
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import conint
+
+from api.models.page import Page, PageCreation, PageFields, PageOrder
 from api.models.user import User
-from api.routers import utils
+from api.routers import gateway, utils
 from api.routers.auth.login import is_connected
+from api.routers.gateway.messages.clientbound import PageUpdated
 
 PAGE_DOES_NOT_EXISTS = "Cette page n'existe pas"
+# Number of pages listed at once, by default and at most
+PAGES_SIZE = 100
+MAX_PAGES_SIZE = 1000
 
 
 router = APIRouter(tags=["page"])
 
 
-@router.get("s", response_model=list[Page])
-async def get_pages(only_me: bool = False, user: User = Depends(is_connected)) -> Page:
-    return await Page.get_all(user if only_me else None)
+@router.get("s", response_model=list[PageFields], response_model_exclude_unset=True)
+async def get_pages(
+    response: Response,
+    order: PageOrder = "edited",
+    cursor: str = None,
+    size: conint(ge=1, le=MAX_PAGES_SIZE) = PAGES_SIZE,
+    author: int = None,
+    active: bool = None,
+    fields: str = None,
+    only_me: bool = False,
+    user: User = Depends(is_connected),
+) -> list[dict[str, Any]]:
+    """
+    Return the pages, the most recently edited (or `created`) first, `size` at a time.
+    When there are more pages, the `X-Next-Cursor` header holds the `cursor` to pass to get the next ones.
+    They can be filtered on their `author` (`only_me` for the current user) and on their state, `active` or archived.
+    `fields` is the comma-separated list of the fields to return, e.g. `id,title`, all of them by default.
+    """
+    after = None
+    if cursor is not None:
+        date, page_id = utils.decode_cursor(cursor, str, int)
+        try:
+            after = datetime.fromisoformat(date), page_id
+        except ValueError:
+            after = None
+
+        # The ids of the pages are 32-bit integers in the database
+        if after is None or not -(2**31) <= page_id < 2**31:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Curseur invalide")
+
+    if fields is not None:
+        fields = {field.strip() for field in fields.split(",")}
+        if unknown := fields - set(Page.__fields__):
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Champs inconnus : {', '.join(sorted(unknown))}")
+
+    author = user.id if only_me else author
+    pages, last = await Page.get_slice(order, after, size, author, active, fields)
+    if last is not None:
+        response.headers[utils.NEXT_CURSOR_HEADER] = utils.encode_cursor(*last)
+
+    return pages
 
 
 @router.get("/{page_id}", response_model=Page)
@@ -26,8 +72,10 @@ async def get_page(page_id: int, user: User = Depends(is_connected)) -> Page:
 @utils.exists(PAGE_DOES_NOT_EXISTS)
 async def update_page(page_id: int, page: PageCreation, user: User = Depends(is_connected)) -> Page:
     result = await Page.update(page_id, page, user)
-    if not result.active:
-        raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
+    if result is not None:
+        await gateway.broadcast(page_id, PageUpdated(page=result))
+        if not result.active:
+            raise HTTPException(status.HTTP_304_NOT_MODIFIED, "Cette page est archivée")
 
     return result
 
@@ -35,13 +83,21 @@ async def update_page(page_id: int, page: PageCreation, user: User = Depends(is_
 @router.put("/{page_id}/archive", response_model=Page)
 @utils.exists(PAGE_DOES_NOT_EXISTS)
 async def archive_page(page_id: int, user: User = Depends(is_connected)) -> Page:
-    return await Page.archive(page_id, user, True)
+    result = await Page.archive(page_id, user, True)
+    if result is not None:
+        await gateway.broadcast(page_id, PageUpdated(page=result))
+
+    return result
 
 
 @router.put("/{page_id}/unarchive", response_model=Page)
 @utils.exists(PAGE_DOES_NOT_EXISTS)
 async def unarchive_page(page_id: int, user: User = Depends(is_connected)) -> Page:
-    return await Page.archive(page_id, user, False)
+    result = await Page.archive(page_id, user, False)
+    if result is not None:
+        await gateway.broadcast(page_id, PageUpdated(page=result))
+
+    return result
 
 
 @router.delete("/{page_id}", response_model=Page)
@@ -4,6 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from api.models import User, UserCreation, UserPass
 from api.routers.auth import Code2FA, hash_password
 from api.routers.auth.login import is_connected, is_connected_pass
+from api.routers.gateway import forget_user
 
 router = APIRouter(
     prefix="/users",
@@ -37,7 +38,9 @@ async def delete_me(twofa: Code2FA, user: UserPass = Depends(is_connected_pass))
                 "Un code de double authentification valide est requis pour effectuer cette action",
             )
 
-    return await user.delete()
+    deleted = await user.delete()
+    forget_user(user.id)
+    return deleted
 
 
 @router.get("/{id}", response_model=User, dependencies=[Depends(is_connected)])
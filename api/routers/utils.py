@@ -1,8 +1,14 @@
+import base64
+import binascii
 import functools
 from typing import Any, Awaitable, Callable, Iterator
 
+import orjson
 from fastapi import HTTPException, status
 
+# Header giving the cursor of the next page of a paginated response, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 def exists(message: str):
     def deco(coro: Callable[..., Awaitable[Any]]):
@@ -30,3 +36,29 @@ def tosnake_iter(name: str) -> Iterator[str]:
 
 def tosnake(name: str) -> str:
     return "_".join(tosnake_iter(name))
+
+
+def encode_cursor(*values: Any) -> str:
+    """Build an opaque pagination token holding the sort key of the last item sent."""
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> list[Any]:
+    """
+    Return the values held by a pagination token, of the given `types`.
+    Answer 400 if it was not made by `encode_cursor`, or not with values of these types.
+    """
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        values = None
+
+    # Exact types, a boolean is not an integer: the values go to the database as they are
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or any(type(value) is not tp for value, tp in zip(values, types))
+    ):
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Curseur invalide")
+
+    return values
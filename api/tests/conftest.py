@@ -0,0 +1,82 @@
+"""
+The tests run against the database of `DATABASE_URL`, the modules needing it are skipped without one.
+Everything they write is rolled back. Run them from the parent directory of `api`: `python -m pytest api/tests`.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from typing import AsyncIterator, Callable
+
+import pytest
+from asyncpg.connection import LoggedQuery
+from databases import Database
+
+# Run by asyncpg on its first use of a type, once per connection
+INTROSPECTION = ("WITH RECURSIVE typeinfo_tree", "SELECT current_setting('jit')", "SELECT set_config('jit'")
+
+
+class QueryLog:
+    """The statements run on a connection, without the introspection of asyncpg."""
+
+    def __init__(self):
+        self.queries: list[LoggedQuery] = []
+
+    def __call__(self, query: LoggedQuery):
+        if not query.query.startswith(INTROSPECTION):
+            self.queries.append(query)
+
+    async def take(self) -> list[LoggedQuery]:
+        """Return the statements logged so far and start again."""
+        # The query loggers are called soon after the queries
+        await asyncio.sleep(0)
+        queries, self.queries = self.queries, []
+        return queries
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def database(anyio_backend, monkeypatch) -> AsyncIterator[Database]:
+    from api.models.base import db
+    from api.models.page import edits
+
+    # The edition dates are written behind, out of the measured statements and after the rollback
+    monkeypatch.setattr(edits, "delay", 3600)
+    try:
+        await db.connect()
+    except OSError as e:
+        pytest.skip(f"No database available: {e}")
+
+    try:
+        yield db
+    finally:
+        if edits.handle is not None:
+            edits.handle.cancel()
+            edits.handle = None
+        edits.dirty.clear()
+        await db.disconnect()
+
+
+@pytest.fixture
+def isolated(database) -> Callable[[], contextlib.AbstractAsyncContextManager[QueryLog]]:
+    """
+    Open a transaction rolled back at the end, and log the statements run inside.
+    Used in the test itself: the connection of `Database` is bound to the task, which is not the one of the fixtures.
+    """
+
+    @contextlib.asynccontextmanager
+    async def isolated() -> AsyncIterator[QueryLog]:
+        async with database.connection() as connection:
+            async with database.transaction(force_rollback=True):
+                log = QueryLog()
+                connection.raw_connection.add_query_logger(log)
+                try:
+                    yield log
+                finally:
+                    connection.raw_connection.remove_query_logger(log)
+
+    return isolated
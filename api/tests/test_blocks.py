@@ -0,0 +1,131 @@
+"""
+Number of statements run by each block operation and listing, authentication aside.
+The writes check the state of their page in the same statement. An added or moved block is also preceded by a read of
+its neighbours: its rank key is generated in Python from their keys, see `rank.py`, so these take 2 statements.
+"""
+import os
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("No DATABASE_URL to run the tests against", allow_module_level=True)
+
+from api.models import page  # noqa: E402
+from api.models.page import Block, BlockCreation, BlockUpdate, PageArchived, PageNotFound  # noqa: E402
+from api.models.rank import generate_n_keys_between  # noqa: E402
+
+pytestmark = pytest.mark.anyio
+
+BLOCKS = 5
+
+OPERATIONS = {
+    "add": (lambda page_id: Block.add(page_id, "new", BlockCreation(type="p", data={})), 2),
+    "add before": (lambda page_id: Block.add(page_id, "new", BlockCreation(type="p", data={}, before="b1")), 2),
+    "move": (lambda page_id: Block.move(page_id, "b4", "b1"), 2),
+    "move to the end": (lambda page_id: Block.move(page_id, "b1", None), 2),
+    "update": (lambda page_id: Block.update(page_id, "b1", BlockUpdate(data={"t": 1})), 1),
+    "update patch": (lambda page_id: Block.update(page_id, "b1", BlockUpdate(patch={"t": 1})), 1),
+    "delete": (lambda page_id: Block.delete(page_id, "b1"), 1),
+    "swap": (lambda page_id: Block.swap(page_id, "b1", "b2"), 1),
+}
+
+
+async def create_page(database, active: bool = True, blocks: int = BLOCKS) -> int:
+    """Insert a page of `blocks` blocks, "b0" to "b4" by default, and its author."""
+    author = await database.fetch_val(
+        "INSERT INTO users (username, email, password) VALUES ('tests', 'tests@example.org', '') RETURNING id"
+    )
+    page_id = await database.fetch_val(
+        "INSERT INTO pages (title, author, active) VALUES ('tests', :author, :active) RETURNING id",
+        {"author": author, "active": active},
+    )
+    await database.execute(
+        """
+    INSERT INTO blocks (id, page_id, sequence, type, data)
+        SELECT 'b' || (keys.i - 1), :page_id, keys.key, 'p', jsonb_build_object('t', keys.i)
+        FROM unnest(CAST(:keys AS text[])) WITH ORDINALITY AS keys(key, i)""",
+        {"page_id": page_id, "keys": generate_n_keys_between(None, None, blocks)},
+    )
+    return page_id
+
+
+@pytest.mark.parametrize("operation, statements", OPERATIONS.values(), ids=OPERATIONS.keys())
+async def test_statements(database, isolated, operation, statements):
+    async with isolated() as log:
+        page_id = await create_page(database)
+        await log.take()
+
+        await operation(page_id)
+        assert len(await log.take()) == statements
+
+
+@pytest.mark.parametrize("operation", [operation for operation, _ in OPERATIONS.values()], ids=OPERATIONS.keys())
+async def test_archived_page(database, isolated, operation):
+    """The state of the page is read by the first statement, nothing else runs on an archived page."""
+    async with isolated() as log:
+        page_id = await create_page(database, active=False)
+        await log.take()
+
+        with pytest.raises(PageArchived):
+            await operation(page_id)
+        assert len(await log.take()) == 1
+
+
+@pytest.mark.parametrize("operation", [operation for operation, _ in OPERATIONS.values()], ids=OPERATIONS.keys())
+async def test_missing_page(database, isolated, operation):
+    async with isolated() as log:
+        page_id = await create_page(database)
+        await log.take()
+
+        with pytest.raises(PageNotFound):
+            await operation(page_id + 1)
+        assert len(await log.take()) == 1
+
+
+async def test_slice_cached(database, isolated):
+    async with isolated() as log:
+        page_id = await create_page(database)
+        await log.take()
+
+        # The edition date of the page, then all its blocks
+        assert len(await Block.get_slice(page_id, size=2)) == 2
+        assert len(await log.take()) == 2
+        # The edition date only
+        assert len(await Block.get_slice(page_id, size=2)) == 2
+        assert len(await log.take()) == 1
+
+
+async def test_slice_long_page(database, isolated, monkeypatch):
+    monkeypatch.setattr(page, "PAGE_CACHE_MAX_BLOCKS", 50)
+    async with isolated() as log:
+        page_id = await create_page(database, blocks=60)
+        await log.take()
+
+        # Found to be too long: its whole content is not read again, even after a change
+        assert len(await Block.get_slice(page_id, size=2)) == 2
+        assert len(await log.take()) == 3
+        await Block.update(page_id, "b1", BlockUpdate(data={"t": 1}))
+        await log.take()
+
+        assert len(await Block.get_slice(page_id, size=2)) == 2
+        queries = await log.take()
+        assert len(queries) == 1
+        assert "LIMIT" in queries[0].query
+
+
+@pytest.mark.parametrize("bypass", ["disabled", "sticky"])
+async def test_slice_uncached(database, isolated, monkeypatch, bypass):
+    if bypass == "disabled":
+        monkeypatch.setattr(page.contents, "maxsize", 0)
+    else:
+        monkeypatch.setattr(page, "sticks_to_primary", lambda: True)
+
+    async with isolated() as log:
+        page_id = await create_page(database)
+        await log.take()
+
+        for _ in range(2):
+            assert len(await Block.get_slice(page_id, size=2)) == 2
+            queries = await log.take()
+            assert len(queries) == 1
+            assert "LIMIT" in queries[0].query
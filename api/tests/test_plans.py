@@ -0,0 +1,194 @@
+"""
+Query plans of the model methods, against a seeded database.
+Every query run by a method is explained, and a sequential scan of a table with more than `ROWS` rows fails its test,
+unless the method reads the whole table anyway.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("No DATABASE_URL to run the tests against", allow_module_level=True)
+
+import orjson  # noqa: E402
+from pydantic import parse_obj_as  # noqa: E402
+
+from api.models.export import ExportFilters, export  # noqa: E402
+from api.models.page import Block, BlockCreation, BlockOperation, BlockUpdate, Page, PageCreation, edits  # noqa: E402
+from api.models.rank import generate_n_keys_between  # noqa: E402
+from api.models.user import User, UserCreation, UserPass  # noqa: E402
+
+pytestmark = pytest.mark.anyio
+
+# Size of the tables that must not be scanned
+ROWS = 1_000
+USERS = 100
+PAGES = 2_000
+# Blocks of each page
+BLOCKS = 10
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+@dataclass
+class Seed:
+    user: User
+    page_id: int
+
+    def blocks(self, *ids: int) -> list[str]:
+        return [f"p{self.page_id}b{i}" for i in ids]
+
+
+async def seed(database) -> Seed:
+    """Insert `PAGES` pages of `BLOCKS` blocks, written by `USERS` users."""
+    authors = [
+        row[0]
+        for row in await database.fetch_all(
+            """
+    INSERT INTO users (username, email, password)
+        SELECT 'plans' || i, 'plans' || i || '@example.org', '' FROM generate_series(1, :users) AS i
+        RETURNING id""",
+            {"users": USERS},
+        )
+    ]
+    await database.execute(
+        """
+    INSERT INTO pages (title, author, created, edited)
+        SELECT 'page ' || i, (CAST(:authors AS integer[]))[1 + i % :users],
+            now() - i * interval '1 minute', now() - i * interval '1 second'
+        FROM generate_series(1, :pages) AS i""",
+        {"authors": authors, "users": USERS, "pages": PAGES},
+    )
+    await database.execute(
+        """
+    INSERT INTO blocks (id, page_id, sequence, type, data)
+        SELECT 'p' || pages.id || 'b' || keys.i, pages.id, keys.key, 'p', jsonb_build_object('t', keys.i)
+        FROM pages, unnest(CAST(:keys AS text[])) WITH ORDINALITY AS keys(key, i)
+        WHERE pages.author = ANY(CAST(:authors AS integer[]))""",
+        {"authors": authors, "keys": generate_n_keys_between(None, None, BLOCKS)},
+    )
+    await database.execute("ANALYZE users, pages, blocks")
+
+    page_id = await database.fetch_val("SELECT min(id) FROM pages WHERE author = :author", {"author": authors[0]})
+    return Seed(await User.get(authors[0]), page_id)
+
+
+def scans(plan: dict) -> list[str]:
+    """Tables sequentially scanned by a plan."""
+    tables = [plan["Relation Name"]] if plan["Node Type"] == "Seq Scan" else []
+    for child in plan.get("Plans", ()):
+        tables += scans(child)
+
+    return tables
+
+
+async def _consume(iterator: AsyncIterator):
+    async for _ in iterator:
+        pass
+
+
+async def _page_lifecycle(s: Seed):
+    page = await PageCreation(title="plans").create(s.user)
+    await Page.update(page.id, PageCreation(title="renamed"), s.user)
+    await Page.archive(page.id, s.user, True)
+    await Page.delete(page.id, s.user)
+
+
+async def _user_lifecycle(s: Seed):
+    user = await UserCreation(email="plans@example.org", username="plans", password="").create()
+    userpass = await UserPass.get(user.username)
+    await userpass.enable_2fa("secret")
+    await userpass.updateTOTPCounter(1)
+    await user.delete()
+
+
+async def _edited(s: Seed):
+    await edits.touch(s.page_id)
+    await edits.flush()
+
+
+def case(name: str, run, full_scan: bool = False):
+    """`full_scan`: the method reads the whole table, a sequential scan is expected."""
+    return pytest.param(run, full_scan, id=name)
+
+
+CASES = [
+    case("Page.get", lambda s: Page.get(s.page_id, s.user)),
+    case("Page.exists, is_archived", lambda s: asyncio.gather(Page.exists(s.page_id), Page.is_archived(s.page_id))),
+    case("Page.get_slice", lambda s: Page.get_slice()),
+    case("Page.get_slice(author, active)", lambda s: Page.get_slice("created", author=s.user.id, active=True)),
+    case("Page.get_slice(after)", lambda s: Page.get_slice(after=(datetime.now(), s.page_id), fields={"id", "title"})),
+    case("Page create, update, archive, delete", _page_lifecycle),
+    case("EditedWriter.flush", _edited),
+    case("Block.get", lambda s: Block.get(s.page_id, *s.blocks(1))),
+    case("Block.get_slice", lambda s: Block.get_slice(s.page_id, None, 25)),
+    case("Block.get_slice(after)", lambda s: Block.get_slice(s.page_id, "a1", 25, payloads=True)),
+    case("Block.iterate_slice", lambda s: _consume(Block.iterate_slice(s.page_id, size=25))),
+    case("Block.sequence_of", lambda s: Block.sequence_of(s.page_id, *s.blocks(2))),
+    case("Block.add", lambda s: Block.add(s.page_id, "new", BlockCreation(type="p", data={}))),
+    case(
+        "Block.add(before)",
+        lambda s: Block.add(s.page_id, "before", BlockCreation(type="p", data={}, before=s.blocks(3)[0])),
+    ),
+    case("Block.update", lambda s: Block.update(s.page_id, *s.blocks(1), BlockUpdate(data={"t": 0}))),
+    case("Block.update(patch)", lambda s: Block.update(s.page_id, *s.blocks(1), BlockUpdate(patch={"t": 1}))),
+    case("Block.swap", lambda s: Block.swap(s.page_id, *s.blocks(1, 2))),
+    case("Block.move", lambda s: Block.move(s.page_id, *s.blocks(4, 1))),
+    case("Block.delete", lambda s: Block.delete(s.page_id, *s.blocks(5))),
+    case(
+        "Block.batch",
+        lambda s: Block.batch(
+            s.page_id,
+            parse_obj_as(
+                list[BlockOperation],
+                [
+                    {"op": "add", "id": "batch", "type": "p", "data": {}},
+                    {"op": "update", "id": s.blocks(6)[0], "patch": {"t": 2}},
+                    {"op": "move", "id": s.blocks(7)[0], "before": s.blocks(1)[0]},
+                    {"op": "delete", "id": s.blocks(8)[0]},
+                ],
+            ),
+        ),
+    ),
+    case("Block._rebalance", lambda s: Block._rebalance(s.page_id, *generate_n_keys_between(None, None, BLOCKS)[2:4])),
+    case("User.get", lambda s: asyncio.gather(User.get(s.user.id), User.get(s.user.username))),
+    case(
+        "UserPass.get, from_email",
+        lambda s: asyncio.gather(UserPass.get(s.user.username), UserPass.from_email(s.user.email)),
+    ),
+    case("User.get_all", lambda s: User.get_all(), full_scan=True),
+    case("User create, 2fa, delete", _user_lifecycle),
+    case("export(author)", lambda s: _consume(export(ExportFilters(author=s.user.id)))),
+    case("export", lambda s: _consume(export(ExportFilters())), full_scan=True),
+]
+
+
+@pytest.mark.parametrize("run, full_scan", CASES)
+async def test_plan(database, isolated, run, full_scan):
+    async with isolated() as log:
+        s = await seed(database)
+        # The tables of the application only, asyncpg introspects the catalogs
+        sizes = {
+            row[0]: row[1]
+            for row in await database.fetch_all(
+                "SELECT relname, reltuples FROM pg_class WHERE relnamespace = 'public'::regnamespace"
+            )
+        }
+        await log.take()
+
+        await run(s)
+        queries = await log.take()
+        assert queries
+
+        raw = database.connection().raw_connection
+        scanned = set()
+        for query in queries:
+            if query.query.lstrip().upper().startswith(EXPLAINABLE):
+                plan = orjson.loads(await raw.fetchval(f"EXPLAIN (FORMAT JSON) {query.query}", *query.args))
+                scanned.update(table for table in scans(plan[0]["Plan"]) if sizes.get(table, 0) > ROWS)
+
+        assert full_scan or not scanned, f"Sequential scan of {', '.join(sorted(scanned))}"
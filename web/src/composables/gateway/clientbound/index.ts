@@ -1,4 +1,10 @@
+import { Block } from "@/stores/block";
 import { Page } from "@/stores/page";
+import { MergePatch } from "@/composables/patch";
+
+interface Batch {
+  messages: ClientBound<keyof ClientBoundMessages>[];
+}
 
 interface JoinedChannel {
   cid: number;
@@ -29,6 +35,8 @@ interface Login {
 
 interface BlockModified {
   block_id: string;
+  block?: Block;
+  patch?: MergePatch;
 }
 
 interface BlockDeleted {
@@ -37,14 +45,28 @@ interface BlockDeleted {
 
 interface BlockAdded {
   block_id: string;
+  block?: Block;
 }
 
 interface BlockMoved {
   block_id: string;
   dest: number;
+  block?: Block;
+}
+
+interface BlocksChanged {
+  added: string[];
+  modified: string[];
+  deleted: string[];
+  moved: string[];
+}
+
+interface PageUpdated {
+  page: Page;
 }
 
 export type ClientBoundMessages = {
+  batch: Batch;
   joined_channel: JoinedChannel;
   left_channel: LeftChannel;
   user_joined_channel: UserJoinedChannel;
@@ -55,6 +77,8 @@ export type ClientBoundMessages = {
   block_deleted: BlockDeleted;
   block_added: BlockAdded;
   block_moved: BlockMoved;
+  blocks_changed: BlocksChanged;
+  page_updated: PageUpdated;
 };
 
 export interface ClientBound<Key extends keyof ClientBoundMessages> {
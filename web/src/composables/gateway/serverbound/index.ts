@@ -1,3 +1,4 @@
+import { MergePatch } from "@/composables/patch";
 import { IServerBound } from "./base";
 
 type RequestJoinChannel = IServerBound<
@@ -5,8 +6,20 @@ type RequestJoinChannel = IServerBound<
   { page_id: number }
 >;
 type LeaveChannel = IServerBound<"leave_channel", {}>;
-type Handshake = IServerBound<"handshake", { version: number }>;
-type BlockModified = IServerBound<"block_modified", { block_id: string }>;
+type Handshake = IServerBound<
+  "handshake",
+  {
+    version: number;
+    block_payloads?: boolean;
+    batch?: boolean;
+    encoding?: "json" | "msgpack";
+    compression?: boolean;
+  }
+>;
+type BlockModified = IServerBound<
+  "block_modified",
+  { block_id: string; patch?: MergePatch }
+>;
 type BlockDeleted = IServerBound<"block_deleted", { block_id: string }>;
 type BlockAdded = IServerBound<"block_added", { block_id: string }>;
 type BlockMoved = IServerBound<
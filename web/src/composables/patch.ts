@@ -0,0 +1,48 @@
+// JSON merge-patches (RFC 7396) of the blocks data, see api/models/patch.py
+
+type Json = null | boolean | number | string | Json[] | { [key: string]: Json };
+export type MergePatch = { [key: string]: Json };
+
+function isObject(value: unknown): value is { [key: string]: Json } {
+  return typeof value === "object" && value !== null && !Array.isArray(value);
+}
+
+function equals(a: unknown, b: unknown): boolean {
+  return JSON.stringify(a) === JSON.stringify(b);
+}
+
+// Return the patch turning `before` into `after`, undefined if they are the same
+export function diff(before: object, after: object): MergePatch | undefined {
+  const patch: MergePatch = {};
+  const source = before as { [key: string]: Json };
+  const target = after as { [key: string]: Json };
+
+  for (const key of Object.keys(source)) {
+    if (!(key in target)) patch[key] = null;
+  }
+  for (const [key, value] of Object.entries(target)) {
+    if (equals(source[key], value)) continue;
+    if (isObject(source[key]) && isObject(value)) {
+      const nested = diff(source[key] as object, value);
+      if (nested !== undefined) patch[key] = nested;
+    } else {
+      // Arrays are replaced as a whole, null values cannot be told apart from removals
+      patch[key] = value;
+    }
+  }
+
+  return Object.keys(patch).length ? patch : undefined;
+}
+
+// Return the target patched, without modifying it
+export function apply(target: unknown, patch: Json): Json {
+  if (!isObject(patch)) return patch;
+
+  const result: { [key: string]: Json } = isObject(target) ? { ...target } : {};
+  for (const [key, value] of Object.entries(patch)) {
+    if (value === null) delete result[key];
+    else result[key] = apply(result[key], value);
+  }
+
+  return result;
+}
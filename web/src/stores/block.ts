@@ -1,18 +1,39 @@
 import requests from "@/composables/api/requests";
+import { MergePatch } from "@/composables/patch";
 import router from "@/router";
 import { defineStore } from "pinia";
 import { reactive, Ref, watch } from "vue";
 import { usePageStore } from "./page";
 
-export type BlockCreation = Pick<Block, "type" | "data">;
-export type BlockUpdate = Partial<BlockCreation>;
+// Number of blocks fetched per request when loading a page
+const BLOCKS_PAGE_SIZE = 500;
+
+export type BlockCreation = { type: string; data: object };
+// Either the whole new data, or a merge-patch of the changed fields
+export type BlockUpdate = Partial<BlockCreation> & { patch?: MergePatch };
+
+export type BlockOperation =
+  | ({ op: "add"; id: string; before?: string } & BlockCreation)
+  | ({ op: "update"; id: string } & BlockUpdate)
+  | { op: "delete"; id: string }
+  | { op: "move"; id: string; before?: string };
+
+export interface BatchResult {
+  added: string[];
+  modified: string[];
+  deleted: string[];
+  moved: string[];
+}
 
 export interface Block {
   id: string;
   page_id: number;
   type: string;
-  data: object;
-  sequence: number;
+  // null in the listings for the large blocks, fetched with `get`
+  data: object | null;
+  sequence: string;
+  size: number;
+  hash: string;
 }
 
 export const useBlockStore = defineStore("block", () => {
@@ -85,15 +106,22 @@ export const useBlockStore = defineStore("block", () => {
     }
   }
 
-  async function list_blocks(start?: string): Promise<Block[]> {
+  async function list_blocks(): Promise<Block[]> {
     if ($page.current == undefined) return [];
-    const params = start ? { start } : undefined;
+    const blocks: Block[] = [];
+    let cursor: string | undefined = undefined;
+
+    // Long pages are fetched in several requests, following the cursor of the next blocks
+    do {
+      let result = await requests.get<Block[]>(
+        `/page/${$page.current.id}/blocks`,
+        { params: { size: BLOCKS_PAGE_SIZE, cursor } }
+      );
+      blocks.push(...result.data);
+      cursor = result.headers["x-next-cursor"];
+    } while (cursor);
 
-    let result = await requests.get<Block[]>(
-      `/page/${$page.current.id}/blocks`,
-      { params }
-    );
-    return result.data;
+    return blocks;
   }
 
   async function delete_block(blockId: string) {
@@ -127,6 +155,24 @@ export const useBlockStore = defineStore("block", () => {
     } catch (err: any) {}
   }
 
+  async function batch(
+    operations: BlockOperation[],
+    error?: Ref<string | undefined>
+  ): Promise<BatchResult | undefined> {
+    if ($page.current === undefined) return;
+    if (error) error.value = undefined;
+
+    try {
+      let result = await requests.post<BatchResult>(
+        `/page/${$page.current.id}/blocks/batch`,
+        operations
+      );
+      return result.data;
+    } catch (err: any) {
+      if (error) error.value = err?.response?.data?.detail || err.message;
+    }
+  }
+
   return {
     get,
     create,
@@ -135,5 +181,6 @@ export const useBlockStore = defineStore("block", () => {
     delete_block,
     move,
     swap,
+    batch,
   };
 });
@@ -37,19 +37,28 @@ export const useGatewayStore = defineStore("gateway", () => {
       retry_time = 1;
       send({
         id: "handshake",
-        data: { version: 0 },
+        data: { version: 1, block_payloads: true, batch: true },
       });
     });
     ws.value.addEventListener("message", (ev) => {
-      const msg: ClientBound<keyof ClientBoundMessages> = JSON.parse(ev.data);
-      const callbacks = listeners[msg.id];
-      if (callbacks) for (const cb of callbacks) cb(msg.data as any);
+      dispatch(JSON.parse(ev.data));
     });
     ws.value.addEventListener("error", (ev) => {
       console.log("error", ev);
     });
   }
 
+  function dispatch(msg: ClientBound<keyof ClientBoundMessages>) {
+    if (msg.id === "batch") {
+      const batch = msg.data as ClientBoundMessages["batch"];
+      for (const message of batch.messages) dispatch(message);
+      return;
+    }
+
+    const callbacks = listeners[msg.id];
+    if (callbacks) for (const cb of callbacks) cb(msg.data as any);
+  }
+
   function disconnect() {
     if (ws.value) ws.value.close();
   }
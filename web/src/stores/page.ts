@@ -5,6 +5,9 @@ import { reactive, Ref, ref } from "vue";
 import { RouteLocationRaw } from "vue-router";
 import requests from "../composables/api/requests";
 
+// Number of pages fetched per request when listing them
+const PAGES_PAGE_SIZE = 100;
+
 export interface Page {
   id: number;
   title: string;
@@ -14,11 +17,14 @@ export interface Page {
   active: boolean;
 }
 
+// The pages of the sidebar, with only the fields it shows
+export type PageSummary = Pick<Page, "id" | "title">;
+
 export interface PageCreation {
   title: string;
 }
 
-export function getPageUrl(page: Page): RouteLocationRaw {
+export function getPageUrl(page: PageSummary): RouteLocationRaw {
   return {
     name: "Page",
     params: { id: page.id, title: slugify(page.title) },
@@ -28,14 +34,42 @@ export function getPageUrl(page: Page): RouteLocationRaw {
 export const usePageStore = defineStore("page", () => {
   const current = ref<Page>();
   const pages = reactive<Page[]>([]);
+  // Active pages of the connected user, the most recently edited first
+  const sidebar = reactive<PageSummary[]>([]);
+  let sidebarAuthor: number | undefined = undefined;
 
   function getPageIndex(page: Page): number {
     return pages.map((p) => p.id).indexOf(page.id);
   }
+  function updateSidebar(page: Page) {
+    const index = sidebar.findIndex((p) => p.id == page.id);
+    if (page.active && page.author == sidebarAuthor) {
+      if (index > -1) sidebar[index] = { id: page.id, title: page.title };
+      else sidebar.unshift({ id: page.id, title: page.title });
+    } else if (index > -1) {
+      sidebar.splice(index, 1);
+    }
+  }
   function updatePage(page: Page) {
     const index = getPageIndex(page);
     if (index > -1) pages[index] = page;
     if (current.value?.id == page.id) current.value = page;
+    updateSidebar(page);
+  }
+
+  // Long listings are fetched in several requests, following the cursor of the next pages
+  async function listAll<T>(params: object): Promise<T[]> {
+    const result: T[] = [];
+    let cursor: string | undefined = undefined;
+    do {
+      let response = await requests.get<T[]>("/pages", {
+        params: { ...params, size: PAGES_PAGE_SIZE, cursor },
+      });
+      result.push(...response.data);
+      cursor = response.headers["x-next-cursor"];
+    } while (cursor);
+
+    return result;
   }
 
   async function create(
@@ -53,6 +87,7 @@ export const usePageStore = defineStore("page", () => {
       if (error) error.value = undefined;
       if (data) current.value = data.value = result.data;
       pages.push(result.data);
+      updateSidebar(result.data);
     } catch (err: any) {
       if (data) data.value = undefined;
       if (error) error.value = err?.response?.data?.detail || err.message;
@@ -96,11 +131,22 @@ export const usePageStore = defineStore("page", () => {
 
   async function list_pages() {
     try {
-      let result = await requests.get<Page[]>("/pages", {
-        params: { only_me: false },
-      });
+      const result = await listAll<Page>({});
       pages.splice(0, pages.length);
-      pages.push(...result.data);
+      pages.push(...result);
+    } catch (err: any) {}
+  }
+
+  async function list_sidebar(author: number) {
+    try {
+      const result = await listAll<PageSummary>({
+        author,
+        active: true,
+        fields: "id,title",
+      });
+      sidebarAuthor = author;
+      sidebar.splice(0, sidebar.length);
+      sidebar.push(...result);
     } catch (err: any) {}
   }
 
@@ -112,6 +158,8 @@ export const usePageStore = defineStore("page", () => {
       let result = await requests.delete<Page>(`/page/${pageId}`);
       const index = getPageIndex(result.data);
       if (index > -1) pages.splice(index, 1);
+      const summary = sidebar.findIndex((p) => p.id == pageId);
+      if (summary > -1) sidebar.splice(summary, 1);
     } catch (err: any) {}
   }
 
@@ -134,7 +182,9 @@ export const usePageStore = defineStore("page", () => {
     create,
     get,
     pages,
+    sidebar,
     list_pages,
+    list_sidebar,
     delete_page,
     changeTitle,
     archive,